@@ -0,0 +1,278 @@
+import asyncio
+import hashlib
+import json
+import os
+
+from dotenv import load_dotenv
+
+from demo import save_current_data, find_new_status_events, iter_alert_recipients
+from lease import alert_lease
+from metrics import EVENTS_SEEN, FAILURES, NEW_EVENTS, RUNS
+from notifier import (begin_lookup, finish_lookup, flush_outbox, pending_lookups, queue_matched_alerts,
+                      queue_matched_chunk)
+from scraper import events_digest, scrape_events
+from stages import collect, stage
+from targets import DEFAULT_TARGET, run_targets
+
+# Load environment variables from the .env file
+load_dotenv()
+
+# 'async' runs the database side of each target on asyncpg, overlapping independent queries
+PIPELINE_MODE = os.getenv('PIPELINE_MODE', 'sync')
+
+
+def mail_alert():
+    # Only one worker in the deployment scrapes, diffs and notifies at a time
+    with alert_lease.hold() as lease:
+        if lease is None:
+            print("⏭️ Another worker holds the alert lease, skipping this run.")
+            return {"lease": "contended"}
+        lookup_error = resume_lookups(lease)
+        # Targets run side by side, so one slow page does not hold up the rest
+        result = combine_results(run_targets(lambda target: monitor_target(lease, target)))
+        if lookup_error:
+            result.setdefault("errors", {})["lookups"] = lookup_error
+        result.update(lease="acquired", lease_token=lease.token)
+        return result
+
+
+def resume_lookups(lease):
+    """Queue alerts for the rest of the subscribers of lookups an earlier run could not finish.
+
+    Their batches go out with this run's flush. Returns the error of a lookup
+    that failed again, or None.
+    """
+    for lookup, events, link, after in pending_lookups():
+        print(f"🔁 Resuming the subscriber lookup for alert {lookup} after {after or 'the start'}.")
+        try:
+            lease.ensure()
+            queue_matched_alerts(events, iter_alert_recipients(events, after=after), link=link, lookup=lookup)
+        except Exception as e:
+            FAILURES.inc(kind='run')
+            print(f"❌ Could not resume the subscriber lookup for alert {lookup}: {e}")
+            return str(e)
+    return None
+
+
+def monitor_target(lease, target):
+    """Run the alert pipeline for one target and attach its stage timings and DB round trips."""
+    if PIPELINE_MODE == 'async':
+        import db_async
+        return db_async.run(monitor_target_async(lease, target))
+    with collect() as stats:
+        result = process_alert(lease, target)
+    return attach_stats(result, stats)
+
+
+def attach_stats(result, stats):
+    result.update(
+        timings={name: round(seconds, 4) for name, seconds in stats["timings"].items()},
+        db_round_trips=stats["counts"].get("db_round_trips", 0),
+    )
+    return result
+
+
+def combine_results(results):
+    """Fold per-target results into one run summary; each target's own result stays under "targets".
+
+    Counts and stage timings are summed over targets, and the run only counts
+    as short-circuited when every target was unchanged.
+    """
+    combined = {"events_seen": 0, "new_events": 0, "events": [], "statuses": {}, "timings": {}, "db_round_trips": 0,
+                "short_circuited": all(result["short_circuited"] for result in results.values())}
+    for name, result in results.items():
+        combined["events_seen"] += result["events_seen"]
+        combined["new_events"] += result["new_events"]
+        combined["events"].extend(dict(event, target=name) for event in result.get("events", []))
+        combined["db_round_trips"] += result["db_round_trips"]
+        for status, count in result.get("statuses", {}).items():
+            combined["statuses"][status] = combined["statuses"].get(status, 0) + count
+        for stage_name, seconds in result["timings"].items():
+            combined["timings"][stage_name] = round(combined["timings"].get(stage_name, 0) + seconds, 4)
+        if "error" in result:
+            combined.setdefault("errors", {})[name] = result["error"]
+    digests = {name: result.get("digest") for name, result in results.items()}
+    combined["digest"] = hashlib.sha256(json.dumps(digests, sort_keys=True).encode('utf-8')).hexdigest()
+    combined["targets"] = results
+    return combined
+
+
+def new_result(target):
+    return {"target": target.name, "source": None, "events_seen": 0, "new_events": 0, "short_circuited": False}
+
+
+def record_scrape(result, target, new_events, source):
+    """Note what the scrape found on the result; returns the digest of the event list."""
+    digest = events_digest(new_events)
+    statuses = {}
+    for event in new_events:
+        statuses[event.status] = statuses.get(event.status, 0) + 1
+    result.update(source=source, events_seen=len(new_events), digest=digest, statuses=statuses)
+    print(f"🔎 Found {len(new_events)} events for {target.name} via {source}.")
+    return digest
+
+
+def record_new_events(result, new_status_events):
+    result["new_events"] = len(new_status_events or [])
+    result["events"] = [event.as_dict() for event in new_status_events or []]
+
+
+def record_saved(result, saved):
+    result["events_changed"] = len(saved or [])
+    result["changes"] = saved or []
+
+
+def record_write_failure(result, target, new_status_events, saved):
+    """Mark the run failed when either database write returned None; returns whether one did."""
+    failed = [name for name, rows in (("held events", new_status_events), ("events", saved)) if rows is None]
+    if not failed:
+        return False
+    result["error"] = f"Could not save the {' and '.join(failed)} to the database."
+    print(f"❌ {result['error']} ({target.name})")
+    return True
+
+
+def announce(target, new_status_events):
+    print(f"\n🚨 ALERT! New events with active tickets detected for {target.name}:\n")
+
+    for event in new_status_events:
+        print(
+            f"🎟️ {event.date} - {' vs '.join(event.teams)} - Status: {event.status}")
+
+
+def process_alert(lease, target=DEFAULT_TARGET):
+    result = new_result(target)
+    try:
+        new_events, source = scrape_events(target=target)
+        digest = record_scrape(result, target, new_events, source)
+
+        # Identical pages skip all DB and SMTP work; the digest is shared through the target's cache
+        if digest == target.cache.get_digest():
+            print(f"✅ Ticket page for {target.name} unchanged since the last run.")
+            result["short_circuited"] = True
+            result["emails"] = flush_outbox()  # Only retries that are due; a no-op otherwise
+            return result
+
+        # A run that lost its lease must not write or alert on behalf of the new holder
+        lease.ensure()
+        new_status_events = find_new_status_events(new_events, target)
+        record_new_events(result, new_status_events)
+
+        if new_status_events:
+            announce(target, new_status_events)
+
+            # Queue alerts for interested subscribers and send them through pooled SMTP sessions
+            lease.ensure()
+            with stage('email'):
+                queue_matched_alerts(new_status_events, iter_alert_recipients(new_status_events), link=target.url)
+
+        elif new_status_events is not None:
+            print(f"✅ No new ticket sales detected for {target.name}.")
+
+        # Also sends earlier batches whose retry is due
+        with stage('email'):
+            result["emails"] = flush_outbox()
+
+        lease.ensure()
+        saved = save_current_data(new_events, target)
+        record_saved(result, saved)
+
+        # Only a run whose writes went through may be skipped next time
+        if not record_write_failure(result, target, new_status_events, saved):
+            target.cache.put_digest(digest)
+
+    except Exception as e:
+        FAILURES.inc(kind='run')
+        result["error"] = str(e)
+        print(f"❌ An error occurred while checking {target.name}: {e}")
+
+    return result
+
+
+async def monitor_target_async(lease, target):
+    with collect() as stats:
+        result = await process_alert_async(lease, target)
+    return attach_stats(result, stats)
+
+
+async def process_alert_async(lease, target=DEFAULT_TARGET):
+    """process_alert with both writes, and the snapshot reads behind them, running concurrently.
+
+    Every target's run shares one event loop, so blocking Redis, SQLite and
+    SMTP calls go to worker threads.
+    """
+    import demo_async
+
+    result = new_result(target)
+    try:
+        new_events, source = await asyncio.to_thread(scrape_events, None, target)
+        digest = record_scrape(result, target, new_events, source)
+
+        # Identical pages skip all DB and SMTP work; the digest is shared through the target's cache
+        if digest == await asyncio.to_thread(target.cache.get_digest):
+            print(f"✅ Ticket page for {target.name} unchanged since the last run.")
+            result["short_circuited"] = True
+            result["emails"] = await asyncio.to_thread(flush_outbox)
+            return result
+
+        # A run that lost its lease must not write or alert on behalf of the new holder
+        lease.ensure()
+        # events_held and the events table are independent, so neither read nor write waits for the
+        # other; each stage is timed once around the pair rather than once per task
+        with stage('diff'):
+            held, snapshot = await asyncio.gather(
+                demo_async.load_held_signatures(target), demo_async.load_snapshot(target))
+        with stage('db_write'):
+            new_status_events, saved = await asyncio.gather(
+                demo_async.find_new_status_events(new_events, held, target),
+                demo_async.save_current_data(new_events, snapshot, target))
+        record_new_events(result, new_status_events)
+        record_saved(result, saved)
+
+        if new_status_events:
+            announce(target, new_status_events)
+
+            lease.ensure()
+            with stage('email'):
+                # Recorded in the outbox like the sync path, so a lookup cut short is resumed by a later run
+                lookup = await asyncio.to_thread(begin_lookup, new_status_events, target.url)
+                bodies, queued = {}, 0
+                try:
+                    async for chunk in demo_async.iter_alert_recipients(new_status_events):
+                        queued += await asyncio.to_thread(
+                            queue_matched_chunk, new_status_events, chunk, bodies, target.url, lookup)
+                except Exception as e:
+                    await asyncio.to_thread(finish_lookup, lookup, e)
+                    raise
+                await asyncio.to_thread(finish_lookup, lookup)
+                if not queued:
+                    print("⚠️ No subscribers to alert.")
+
+        elif new_status_events is not None:
+            print(f"✅ No new ticket sales detected for {target.name}.")
+
+        with stage('email'):
+            result["emails"] = await asyncio.to_thread(flush_outbox)
+
+        if not record_write_failure(result, target, new_status_events, saved):
+            await asyncio.to_thread(target.cache.put_digest, digest)
+
+    except Exception as e:
+        FAILURES.inc(kind='run')
+        result["error"] = str(e)
+        print(f"❌ An error occurred while checking {target.name}: {e}")
+
+    return result
+
+
+def record_run(result):
+    """Count a finished run in this process's metrics; None stands for a job that failed outright."""
+    if result is None or "errors" in result:
+        RUNS.inc(outcome='failed')
+    elif result.get("lease") == "contended":
+        RUNS.inc(outcome='contended')
+    else:
+        RUNS.inc(outcome='short_circuited' if result["short_circuited"] else 'completed')
+    if result is not None:
+        EVENTS_SEEN.inc(result.get("events_seen", 0))
+        NEW_EVENTS.inc(result.get("new_events", 0))
@@ -0,0 +1,90 @@
+"""Measure what a cold process pays to import the app and to start serving.
+
+Every run is a fresh interpreter, as on a newly scaled-out instance. Imports
+are timed with `python -X importtime`; --startup also runs the API lifespan
+(which warms the database pool, so point NEON_DB_* at a reachable server).
+
+Usage: python -m benchmarks.cold_start [--runs N] [--top N] [--startup] [module ...]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODULES = ('main', 'hello', 'worker', 'alerts')
+# Libraries only the scraping path should load
+HEAVY = ('selenium', 'webdriver_manager', 'bs4', 'lxml', 'httpx', 'smtplib')
+
+STARTUP = """
+import time
+started = time.perf_counter()
+from fastapi.testclient import TestClient
+import main
+with TestClient(main.app) as client:
+    client.get('/scheduler')
+print(time.perf_counter() - started)
+"""
+
+
+def run_python(args):
+    started = time.perf_counter()
+    completed = subprocess.run([sys.executable, *args], cwd=ROOT, capture_output=True, text=True, check=True)
+    return time.perf_counter() - started, completed
+
+
+def parse_importtime(stderr):
+    """Return (self seconds per top-level package, cumulative seconds per imported module)."""
+    by_package, cumulative = {}, {}
+    for line in stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        name = name.strip()
+        package = name.split('.')[0]
+        by_package[package] = by_package.get(package, 0) + int(self_us) / 1e6
+        cumulative[name] = int(cumulative_us) / 1e6
+    return by_package, cumulative
+
+
+def measure_import(module, runs):
+    code = f"import sys, {module}; print(','.join(m for m in {HEAVY!r} if m in sys.modules))"
+    walls, imports, packages, heavy = [], [], {}, ''
+    for _ in range(runs):
+        wall, completed = run_python(['-X', 'importtime', '-c', code])
+        by_package, cumulative = parse_importtime(completed.stderr)
+        walls.append(wall)
+        imports.append(cumulative.get(module, 0))
+        for package, seconds in by_package.items():
+            packages.setdefault(package, []).append(seconds)
+        heavy = completed.stdout.strip()
+    packages = {package: statistics.median(seconds) for package, seconds in packages.items()}
+    return statistics.median(walls), statistics.median(imports), packages, heavy
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--top', type=int, default=10, help='heaviest packages to list per module')
+    parser.add_argument('--startup', action='store_true', help='also time the API lifespan')
+    parser.add_argument('modules', nargs='*')
+    args = parser.parse_args()
+
+    for module in args.modules or MODULES:
+        wall, imported, packages, heavy = measure_import(module, args.runs)
+        print(f"\n{module}: process {wall * 1000:.0f} ms, import {imported * 1000:.0f} ms, "
+              f"heavy libraries loaded: {heavy or 'none'}")
+        print(f"{'package':<24}{'self (ms)':>10}")
+        for package, seconds in sorted(packages.items(), key=lambda item: -item[1])[:args.top]:
+            print(f"{package:<24}{seconds * 1000:>10.1f}")
+
+    if args.startup:
+        timings = [float(run_python(['-c', STARTUP])[1].stdout.strip().splitlines()[-1]) for _ in range(args.runs)]
+        print(f"\nmain startup (import + lifespan): p50 {statistics.median(timings) * 1000:.0f} ms, "
+              f"max {max(timings) * 1000:.0f} ms")
+
+
+if __name__ == '__main__':
+    main()
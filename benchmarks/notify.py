@@ -0,0 +1,39 @@
+"""Measure outbox dispatch throughput against a local SMTP sink.
+
+Usage: python -m benchmarks.notify [--recipients N] [--batch-size N] [--concurrency N]
+"""
+import argparse
+import os
+import tempfile
+
+from benchmarks.smtp_sink import SmtpSink
+from events import Event
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--recipients', type=int, default=5000)
+    parser.add_argument('--batch-size', type=int, default=50)
+    parser.add_argument('--concurrency', type=int, default=4)
+    args = parser.parse_args()
+
+    with SmtpSink() as sink, tempfile.TemporaryDirectory() as tmp:
+        # The sink speaks plain SMTP without AUTH; set before notifier reads its settings
+        os.environ.update(EMAIL_HOST=sink.host, EMAIL_PORT=str(sink.port), EMAIL_USE_TLS='false', EMAIL_USER='')
+        import notifier
+
+        outbox = notifier.Outbox(os.path.join(tmp, 'outbox.sqlite3'))
+        dispatcher = notifier.Dispatcher(outbox, notifier.SmtpSessionPool(args.concurrency), args.concurrency)
+        events = [Event("Sat, Mar 22, 2025 07:30 PM", ["RCB", "KKR"], "BUY TICKETS")]
+        recipients = [f'fan{i}@example.com' for i in range(args.recipients)]
+
+        outbox.enqueue(notifier.ALERT_SUBJECT, notifier.render_alert_email(events), recipients, args.batch_size)
+        stats = dispatcher.dispatch()
+        dispatcher.sessions.close()
+
+    print(stats)
+    print(f"sink received {sink.messages} messages for {sink.recipients} recipients")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,89 @@
+"""Compare the full and lean browser profiles on the live ticket page.
+
+Usage: python -m benchmarks.page_load [--runs N] [--output report.json]
+"""
+import argparse
+import json
+import statistics
+import time
+
+from selenium.common.exceptions import TimeoutException
+from selenium.webdriver.common.by import By
+from selenium.webdriver.support import expected_conditions as EC
+from selenium.webdriver.support.ui import WebDriverWait
+
+from driver_pool import create_driver
+from scraper import WAIT_TIMEOUT
+from targets import TICKET_URL
+
+
+def transfer_stats(driver):
+    """Count finished requests and encoded bytes from the performance log."""
+    requests, transferred = 0, 0
+    for entry in driver.get_log('performance'):
+        message = json.loads(entry['message'])['message']
+        if message.get('method') == 'Network.loadingFinished':
+            requests += 1
+            transferred += message['params'].get('encodedDataLength', 0)
+    return requests, transferred
+
+
+def measure(profile, runs):
+    driver = create_driver(profile=profile, performance_log=True)
+    samples = []
+    try:
+        for _ in range(runs):
+            driver.get('about:blank')
+            driver.get_log('performance')
+
+            started = time.perf_counter()
+            driver.get(TICKET_URL)
+            loaded = time.perf_counter()
+            try:
+                WebDriverWait(driver, WAIT_TIMEOUT).until(
+                    EC.presence_of_element_located((By.CSS_SELECTOR, 'div.css-q38j1a')))
+            except TimeoutException:
+                pass
+            first_event = time.perf_counter()
+
+            requests, transferred = transfer_stats(driver)
+            samples.append({
+                "page_load_s": loaded - started,
+                "time_to_data_s": first_event - started,
+                "requests": requests,
+                "bytes": transferred,
+            })
+    finally:
+        driver.quit()
+
+    return {
+        "profile": profile,
+        "runs": runs,
+        "median_page_load_s": statistics.median(s["page_load_s"] for s in samples),
+        "median_time_to_data_s": statistics.median(s["time_to_data_s"] for s in samples),
+        "median_requests": statistics.median(s["requests"] for s in samples),
+        "median_bytes": statistics.median(s["bytes"] for s in samples),
+        "samples": samples,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=5)
+    parser.add_argument('--output', help='write the full report to this JSON file')
+    args = parser.parse_args()
+
+    report = [measure(profile, args.runs) for profile in ('full', 'lean')]
+
+    print(f"{'profile':<8}{'load (s)':>10}{'to data (s)':>13}{'requests':>10}{'KiB':>10}")
+    for row in report:
+        print(f"{row['profile']:<8}{row['median_page_load_s']:>10.2f}{row['median_time_to_data_s']:>13.2f}"
+              f"{row['median_requests']:>10.0f}{row['median_bytes'] / 1024:>10.0f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
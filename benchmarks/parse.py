@@ -0,0 +1,98 @@
+"""Compare event extraction against the original full-tree parse on saved pages.
+
+Usage: python -m benchmarks.parse [--runs N] [fixture.html ...]
+"""
+import argparse
+import glob
+import os
+import statistics
+import time
+import tracemalloc
+
+from bs4 import BeautifulSoup
+
+from event_parser import parse_events
+
+FIXTURES = os.path.join(os.path.dirname(__file__), 'fixtures', '*.html')
+
+
+def legacy_parse_events(html):
+    """The parse mail_alert used to do: a full html.parser tree, then find/find_all per block."""
+    soup = BeautifulSoup(html, 'html.parser')
+    new_events = []
+    event_blocks = soup.find_all('div', class_='css-q38j1a')
+
+    for block in event_blocks:
+        date_div = block.find('div', class_='css-b2t39r')
+        date = date_div.find('p').get_text(
+            strip=True) if date_div and date_div.find('p') else 'N/A'
+
+        teams = [team_div.get_text(strip=True) for team_div in block.find_all(
+            'p', class_='chakra-text css-10rvbm3')]
+        if not teams:
+            special_event = block.find(
+                'p', class_='chakra-text css-vahgqk')
+            if special_event:
+                teams.append(special_event.get_text(strip=True))
+
+        status_button = block.find('button')
+        status = status_button.get_text(
+            strip=True) if status_button else 'N/A'
+
+        new_events.append({
+            "date": date,
+            "teams": teams if teams else ["N/A"],
+            "status": status
+        })
+    return new_events
+
+
+def measure(parse, html, runs):
+    timings = []
+    for _ in range(runs):
+        started = time.perf_counter()
+        parse(html)
+        timings.append(time.perf_counter() - started)
+
+    tracemalloc.start()
+    events = parse(html)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return events, statistics.median(timings), peak
+
+
+def as_dicts(events):
+    return [event.as_dict() for event in events]
+
+
+def available_parsers():
+    parsers = [('legacy', legacy_parse_events), ('html.parser', lambda html: as_dicts(parse_events(html, 'html.parser')))]
+    try:
+        import lxml  # noqa: F401
+        parsers.append(('lxml', lambda html: as_dicts(parse_events(html, 'lxml'))))
+    except ImportError:
+        pass
+    return parsers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=20)
+    parser.add_argument('fixtures', nargs='*')
+    args = parser.parse_args()
+
+    for path in args.fixtures or sorted(glob.glob(FIXTURES)):
+        with open(path, encoding='utf-8') as f:
+            html = f.read()
+        print(f"\n{os.path.basename(path)} ({len(html) / 1024:.0f} KiB)")
+        print(f"{'parser':<14}{'median (ms)':>13}{'peak (KiB)':>12}{'events':>8}  same as legacy")
+
+        expected = None
+        for name, parse in available_parsers():
+            events, median, peak = measure(parse, html, args.runs)
+            expected = events if expected is None else expected
+            print(f"{name:<14}{median * 1000:>13.1f}{peak / 1024:>12.0f}{len(events):>8}  {events == expected}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,162 @@
+"""Replay a saved ticket page through the whole alert pipeline and time each stage.
+
+The page is served from a local HTTP server and mail goes to a local SMTP sink.
+The database is the PostgreSQL server in the NEON_DB_* settings (point them at
+a local server); everything is created in the `rcb_bench` schema, which is
+emptied before every cold iteration.
+
+Usage: python -m benchmarks.pipeline [--iterations N] [--subscribers N] [--warm] [--mode sync|async]
+                                     [--fixture page.html] [--output results.json]
+"""
+import argparse
+import json
+import os
+import platform
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from benchmarks.smtp_sink import SmtpSink
+
+FIXTURE = os.path.join(os.path.dirname(__file__), 'fixtures', 'ticket_page.html')
+SCHEMA = 'rcb_bench'
+STAGES = ('fetch', 'parse', 'diff', 'db_write', 'email')
+
+
+class PageServer:
+    """Serve one saved page on every path, like the storefront would."""
+
+    def __init__(self, body):
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/html; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, *args):
+                pass
+
+        self._server = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self.url = f'http://127.0.0.1:{self._server.server_address[1]}/ticket'
+
+    def __enter__(self):
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        return self
+
+    def __exit__(self, *exc):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def percentile(values, pct):
+    values = sorted(values)
+    return values[round(pct / 100 * (len(values) - 1))] if values else None
+
+
+def summarize(values, scale=1):
+    return {
+        "p50": round(percentile(values, 50) * scale, 3),
+        "p95": round(percentile(values, 95) * scale, 3),
+        "mean": round(sum(values) / len(values) * scale, 3),
+    }
+
+
+def prepare_database(subscribers):
+    from psycopg2.extras import execute_values
+
+    from db_connection import get_connection
+    from migrate import migrate
+    from targets import DEFAULT_TARGET
+
+    with get_connection() as connection, connection.cursor() as cursor:
+        cursor.execute(f"""
+            CREATE SCHEMA IF NOT EXISTS {SCHEMA};
+            CREATE TABLE IF NOT EXISTS {SCHEMA}.email (email text);
+            TRUNCATE {SCHEMA}.email;
+        """)
+        execute_values(cursor, f"INSERT INTO {SCHEMA}.email (email) VALUES %s",
+                       [(f'fan{i}@example.com',) for i in range(subscribers)], page_size=10000)
+        connection.commit()
+    migrate([DEFAULT_TARGET])
+
+
+def reset_state():
+    from db_connection import get_connection
+    from snapshot_cache import snapshot_cache
+
+    with get_connection() as connection, connection.cursor() as cursor:
+        cursor.execute(f"TRUNCATE {SCHEMA}.rcb_events, {SCHEMA}.events_held, {SCHEMA}.rcb_status_history, "
+                       f"{SCHEMA}.rcb_status_summary")
+        connection.commit()
+    snapshot_cache.invalidate()  # Also forgets the last page digest
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--iterations', type=int, default=30)
+    parser.add_argument('--subscribers', type=int, default=1000)
+    parser.add_argument('--fixture', default=FIXTURE)
+    parser.add_argument('--warm', action='store_true',
+                        help='keep state between iterations, so unchanged pages short-circuit')
+    parser.add_argument('--mode', choices=('sync', 'async'), default='sync',
+                        help='psycopg2 pipeline or the asyncpg one (PIPELINE_MODE)')
+    parser.add_argument('--output', help='write the results to this JSON file')
+    args = parser.parse_args()
+
+    with open(args.fixture, 'rb') as f:
+        page = f.read()
+
+    with PageServer(page) as server, SmtpSink() as sink, tempfile.TemporaryDirectory() as tmp:
+        # Every module reads its settings at import time, so configure before importing the pipeline
+        os.environ.update(
+            SCRAPE_MODE='http', TICKET_URL=server.url, TICKET_API_URL='',
+            EMAIL_HOST=sink.host, EMAIL_PORT=str(sink.port), EMAIL_USE_TLS='false', EMAIL_USER='',
+            OUTBOX_PATH=os.path.join(tmp, 'outbox.sqlite3'), EMAIL_RETRY_BASE='0',
+            REDIS_URL='', MIN_RUN_INTERVAL='0', HOST_MIN_INTERVAL='0',
+            PGOPTIONS=f'-c search_path={SCHEMA}', PIPELINE_MODE=args.mode,
+        )
+        import alerts
+
+        prepare_database(args.subscribers)
+        runs = []
+        for _ in range(args.iterations):
+            if not args.warm:
+                reset_state()
+            started = time.perf_counter()
+            result = alerts.mail_alert()
+            result["wall_s"] = time.perf_counter() - started
+            runs.append(result)
+
+    report = {
+        "fixture": os.path.basename(args.fixture),
+        "iterations": args.iterations,
+        "subscribers": args.subscribers,
+        "warm": args.warm,
+        "mode": args.mode,
+        "python": platform.python_version(),
+        "wall_ms": summarize([run["wall_s"] for run in runs], 1000),
+        "stages_ms": {
+            name: summarize([run.get("timings", {}).get(name, 0) for run in runs], 1000) for name in STAGES
+        },
+        "db_round_trips": summarize([run.get("db_round_trips", 0) for run in runs]),
+        "short_circuited": sum(1 for run in runs if run.get("short_circuited")),
+        "emails_received": sink.messages,
+        "recipients_received": sink.recipients,
+    }
+
+    print(f"\n{'stage':<12}{'p50 (ms)':>10}{'p95 (ms)':>10}")
+    for name, row in [("wall", report["wall_ms"])] + list(report["stages_ms"].items()):
+        print(f"{name:<12}{row['p50']:>10.1f}{row['p95']:>10.1f}")
+    print(f"DB round trips per run: p50 {report['db_round_trips']['p50']:.0f}, "
+          f"p95 {report['db_round_trips']['p95']:.0f}")
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,144 @@
+import asyncio
+import os
+import threading
+
+import orjson
+from dotenv import load_dotenv
+from redis.exceptions import RedisError
+
+from redis_client import get_redis
+
+# Load environment variables from the .env file
+load_dotenv()
+
+BROADCAST_QUEUE_SIZE = int(os.getenv('BROADCAST_QUEUE_SIZE', 64))  # Messages buffered per listener before the oldest is dropped
+BROADCAST_KEEPALIVE = float(os.getenv('BROADCAST_KEEPALIVE', 15))  # Seconds between keep-alives on idle streams
+
+CHANNEL = 'rcb:events:changes'
+
+
+def change_message(target_name, kind, events):
+    """Serialize one batch of changes once; every subscriber shares the same string."""
+    return orjson.dumps({"kind": kind, "target": target_name, "events": events}).decode('utf-8')
+
+
+class Subscription:
+    """One listener's bounded queue; when it is full the oldest message makes room for the newest."""
+
+    def __init__(self, size=BROADCAST_QUEUE_SIZE):
+        self.queue = asyncio.Queue(maxsize=size)
+        self.dropped = 0
+
+    def offer(self, message):
+        if self.queue.full():
+            self.queue.get_nowait()
+            self.dropped += 1
+        self.queue.put_nowait(message)
+
+    async def next(self, timeout=BROADCAST_KEEPALIVE):
+        """Return the next message, or None after `timeout` seconds without one."""
+        try:
+            return await asyncio.wait_for(self.queue.get(), timeout)
+        except asyncio.TimeoutError:
+            return None
+
+    def take_dropped(self):
+        dropped, self.dropped = self.dropped, 0
+        return dropped
+
+
+class Broadcaster:
+    """Fan event changes out to SSE and WebSocket listeners on the API's event loop.
+
+    Publishing never blocks: messages are handed to the loop and each listener
+    keeps at most BROADCAST_QUEUE_SIZE of them, so a slow client only loses
+    its own oldest messages. With REDIS_URL set, changes written by any
+    worker arrive through the rcb:events:changes channel.
+    """
+
+    def __init__(self, client=None):
+        self.client = client
+        self.published = 0
+        self._subscribers = set()
+        self._loop = None
+        self._stop = threading.Event()
+        self._listener = None
+
+    def start(self, loop):
+        """Attach to the API's running loop and, with Redis, start relaying the changes channel."""
+        self._loop = loop
+        self._stop.clear()
+        if self.client is not None and self._listener is None:
+            self._listener = threading.Thread(target=self._listen, name='broadcast-listener', daemon=True)
+            self._listener.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._listener is not None:
+            self._listener.join(timeout=5)
+            self._listener = None
+        self._loop = None
+
+    def subscribe(self):
+        subscription = Subscription()
+        self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        self._subscribers.discard(subscription)
+
+    def publish(self, target_name, kind, events):
+        """Announce changed events from the pipeline, in whichever process wrote them."""
+        if not events:
+            return
+        message = change_message(target_name, kind, events)
+        if self.client is not None:
+            try:
+                self.client.publish(CHANNEL, message)
+                return
+            except RedisError as e:
+                print(f"⚠️ Could not publish event changes: {e}")
+        self.deliver(message)
+
+    def publish_result(self, result):
+        """Announce the changes a finished job reported; only needed when workers cannot reach Redis."""
+        if self.client is not None:
+            return
+        for name, target_result in ((result or {}).get("targets") or {}).items():
+            if target_result.get("changes"):
+                self.deliver(change_message(name, 'events', target_result["changes"]))
+            if target_result.get("events"):
+                self.deliver(change_message(name, 'held', target_result["events"]))
+
+    def deliver(self, message):
+        """Hand a serialized message to the local listeners; safe to call from any thread."""
+        loop = self._loop
+        if loop is None or loop.is_closed():
+            return
+        loop.call_soon_threadsafe(self._fan_out, message)
+
+    def stats(self):
+        return {"subscribers": len(self._subscribers), "published": self.published,
+                "backend": 'redis' if self.client is not None else 'local'}
+
+    def _fan_out(self, message):
+        self.published += 1
+        for subscription in list(self._subscribers):
+            subscription.offer(message)
+
+    def _listen(self):
+        while not self._stop.is_set():
+            try:
+                pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+                pubsub.subscribe(CHANNEL)
+                while not self._stop.is_set():
+                    message = pubsub.get_message(timeout=1.0)
+                    if message is not None:
+                        self.deliver(message["data"])
+                pubsub.close()
+            except RedisError as e:
+                print(f"⚠️ Event change channel unavailable: {e}")
+                self._stop.wait(5)
+
+
+broadcaster = Broadcaster(get_redis())
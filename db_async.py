@@ -0,0 +1,86 @@
+import asyncio
+import os
+import shlex
+import threading
+from contextlib import asynccontextmanager
+
+import asyncpg
+
+import stages
+from db_connection import DATABASE, HOST, PASSWORD, POOL_MAX, POOL_MIN, POOL_TIMEOUT, PORT, USER
+
+_loop = None
+_loop_lock = threading.Lock()
+_pool = None
+_pool_lock = None
+
+
+def server_settings():
+    """Settings from PGOPTIONS ('-c name=value ...'), which libpq applies for psycopg2 but asyncpg ignores."""
+    settings = {}
+    tokens = shlex.split(os.getenv('PGOPTIONS', ''))
+    for i, token in enumerate(tokens):
+        if token == '-c' and i + 1 < len(tokens):
+            option = tokens[i + 1]
+        elif token.startswith('-c'):
+            option = token[2:]
+        elif token.startswith('--'):
+            option = token[2:]
+        else:
+            continue
+        name, _, value = option.partition('=')
+        settings[name.replace('-', '_')] = value
+    return settings
+
+
+def run(coro):
+    """Run a coroutine on the shared pipeline event loop and return its result.
+
+    The loop lives on its own daemon thread for the life of the process, so
+    the asyncpg pool and its connections survive from one run to the next.
+    """
+    global _loop
+    with _loop_lock:
+        if _loop is None:
+            _loop = asyncio.new_event_loop()
+            threading.Thread(target=_loop.run_forever, name='pipeline-loop', daemon=True).start()
+    return asyncio.run_coroutine_threadsafe(coro, _loop).result()
+
+
+async def get_pool():
+    """Return the asyncpg pool, creating it on first use."""
+    global _pool, _pool_lock
+    if _pool_lock is None:
+        _pool_lock = asyncio.Lock()
+    async with _pool_lock:
+        if _pool is None:
+            _pool = await asyncpg.create_pool(
+                host=HOST, port=int(PORT), database=DATABASE, user=USER, password=PASSWORD,
+                min_size=POOL_MIN, max_size=POOL_MAX, timeout=POOL_TIMEOUT, server_settings=server_settings())
+            print("Async connection pool to the database established successfully.")
+    return _pool
+
+
+@asynccontextmanager
+async def connection():
+    """Borrow a pooled asyncpg connection: `async with connection() as conn: ...`."""
+    pool = await get_pool()
+    async with pool.acquire(timeout=POOL_TIMEOUT) as conn:
+        yield conn
+
+
+def count_round_trip():
+    stages.count("db_round_trips")
+
+
+async def close_pool():
+    global _pool
+    if _pool is not None:
+        await _pool.close()
+        _pool = None
+
+
+def close():
+    """Close the pool from synchronous code, if the shared loop was ever started."""
+    if _loop is not None:
+        run(close_pool())
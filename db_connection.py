@@ -1,7 +1,14 @@
 import psycopg2
+import psycopg2.extensions
 import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
 from dotenv import load_dotenv
 
+import stages
+
 # Load environment variables from a .env file
 load_dotenv()
 
@@ -12,6 +19,31 @@ DATABASE = os.getenv('NEON_DB_DATABASE')
 USER = os.getenv('NEON_DB_USER')
 PASSWORD = os.getenv('NEON_DB_PASSWORD')
 
+# Pool sizing and health-check settings
+POOL_MIN = int(os.getenv('DB_POOL_MIN', 1))
+POOL_MAX = int(os.getenv('DB_POOL_MAX', 5))
+POOL_TIMEOUT = float(os.getenv('DB_POOL_TIMEOUT', 30))  # Seconds to wait for a free connection
+# Connections idle for longer than this are pinged before reuse (Neon drops idle sessions)
+POOL_CHECK_AFTER = float(os.getenv('DB_POOL_CHECK_AFTER', 30))
+
+
+class CountingCursor(psycopg2.extensions.cursor):
+    """Cursor that counts the statements and server-side fetches it sends."""
+
+    def execute(self, query, vars=None):
+        _count_round_trip()
+        return super().execute(query, vars)
+
+    def fetchmany(self, size=None):
+        if self.name:  # Named cursors go back to the server for every batch
+            _count_round_trip()
+        return super().fetchmany(size) if size is not None else super().fetchmany()
+
+
+def _count_round_trip():
+    pool._count("round_trips")
+    stages.count("db_round_trips")
+
 
 def connect_to_db():
     """Establish and return a connection to the PostgreSQL database."""
@@ -21,10 +53,136 @@ def connect_to_db():
             port=PORT,
             database=DATABASE,
             user=USER,
-            password=PASSWORD
+            password=PASSWORD,
+            cursor_factory=CountingCursor
         )
         print("Connection to the database established successfully.")
         return connection
     except Exception as e:
         print(f"Error connecting to the database: {e}")
         return None
+
+
+class ConnectionPool:
+    """Process-wide, thread-safe pool of PostgreSQL connections."""
+
+    def __init__(self, minconn=POOL_MIN, maxconn=POOL_MAX, timeout=POOL_TIMEOUT,
+                 check_after=POOL_CHECK_AFTER, factory=connect_to_db):
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.timeout = timeout
+        self.check_after = check_after
+        self.factory = factory
+        self._idle = deque()  # (connection, returned_at) pairs, most recently used last
+        self._slots = threading.BoundedSemaphore(maxconn)
+        self._lock = threading.Lock()
+        self._counters = {"in_use": 0, "waits": 0, "handshakes": 0, "handshakes_saved": 0, "discarded": 0,
+                          "round_trips": 0}
+
+    @contextmanager
+    def connection(self):
+        """Check out a healthy connection; roll back anything left open when it comes back."""
+        if not self._slots.acquire(blocking=False):
+            self._count("waits")
+            if not self._slots.acquire(timeout=self.timeout):
+                raise psycopg2.OperationalError("Timed out waiting for a database connection.")
+
+        connection = None
+        try:
+            connection = self._checkout()
+            self._count("in_use")
+            try:
+                yield connection
+            except BaseException:  # Includes GeneratorExit from a caller that stops iterating early
+                self._release(connection, broken=True)
+                raise
+            else:
+                self._release(connection)
+        finally:
+            if connection is not None:
+                self._count("in_use", -1)
+            self._slots.release()
+
+    def warm(self):
+        """Open connections up to the configured minimum."""
+        while len(self._idle) < self.minconn:
+            self._idle.append((self._open(), time.monotonic()))
+
+    def close(self):
+        while self._idle:
+            connection, _ = self._idle.popleft()
+            connection.close()
+
+    def stats(self):
+        with self._lock:
+            return dict(self._counters, idle=len(self._idle), max=self.maxconn)
+
+    def _count(self, name, amount=1):
+        with self._lock:
+            self._counters[name] += amount
+
+    def _open(self):
+        connection = self.factory()
+        if connection is None:
+            raise psycopg2.OperationalError("Unable to connect to the database.")
+        self._count("handshakes")
+        return connection
+
+    def _checkout(self):
+        while True:
+            try:
+                connection, returned_at = self._idle.pop()
+            except IndexError:
+                return self._open()
+            if self._is_healthy(connection, returned_at):
+                self._count("handshakes_saved")
+                return connection
+            self._discard(connection)
+
+    def _release(self, connection, broken=False):
+        if connection.closed:
+            self._discard(connection)
+            return
+        try:
+            # A no-op after commit(); ends read-only transactions so the connection is idle in the pool
+            connection.rollback()
+        except psycopg2.Error:
+            self._discard(connection)
+            return
+        if broken and not self._is_healthy(connection, 0):
+            self._discard(connection)
+            return
+        self._idle.append((connection, time.monotonic()))
+
+    def _discard(self, connection):
+        self._count("discarded")
+        try:
+            connection.close()
+        except psycopg2.Error:
+            pass
+
+    def _is_healthy(self, connection, returned_at):
+        if connection.closed:
+            return False
+        if time.monotonic() - returned_at < self.check_after:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            connection.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+
+pool = ConnectionPool()
+
+
+def get_connection():
+    """Borrow a pooled connection: `with get_connection() as connection: ...`."""
+    return pool.connection()
+
+
+def pool_stats():
+    """Return the pool counters (connections in use, waits, handshakes saved, round trips)."""
+    return pool.stats()
@@ -1,173 +1,455 @@
-from db_connection import connect_to_db
-from datetime import datetime
-
-
-def load_previous_data():
+import os
+import psycopg2
+from contextlib import contextmanager
+from datetime import datetime, timedelta, timezone
+from psycopg2 import sql
+from psycopg2.extras import execute_values
+from db_connection import get_connection
+from snapshot_cache import event_key, held_signature
+from targets import DEFAULT_TARGET
+from read_cache import read_cache
+from broadcast import broadcaster
+from metrics import DB_CALL_SECONDS, FAILURES
+from stages import stage
+from events import format_date
+
+SUBSCRIBER_CHUNK_SIZE = int(os.getenv('SUBSCRIBER_CHUNK_SIZE', 5000))  # Rows per fetch from the server-side cursor
+HISTORY_WINDOW_DAYS = float(os.getenv('HISTORY_WINDOW_DAYS', 7))  # Days of transitions returned when no range is given
+HISTORY_LIMIT = int(os.getenv('HISTORY_LIMIT', 1000))  # Most transitions one history request returns
+
+# Statements shared with demo_async. Table names are filled in as identifiers, {rows} is the row
+# source (VALUES %s here, a JSON expansion there) and {teams}/{statuses} the array parameters.
+SNAPSHOT_QUERY = "SELECT event_date, status FROM {events}"
+HELD_QUERY = "SELECT event_date, teams, status FROM {held}"
+SAVE_EVENTS_QUERY = """
+    WITH changed AS (
+        INSERT INTO {events} AS events (event_date, teams, status)
+        {rows}
+        ON CONFLICT (event_date) DO UPDATE
+            SET status = EXCLUDED.status
+            WHERE events.status IS DISTINCT FROM EXCLUDED.status
+        RETURNING event_date, teams, status, (xmax = 0) AS inserted
+    ), history AS (
+        INSERT INTO {history} (event_date, teams, status)
+        SELECT event_date, teams, status FROM changed
+    ), summary AS (
+        INSERT INTO {summary} AS summary (event_date, on_sale_at, sold_out_at)
+        SELECT event_date,
+               CASE WHEN status NOT IN ('COMING SOON', 'SOLD OUT') THEN now() END,
+               CASE WHEN status = 'SOLD OUT' THEN now() END
+        FROM changed
+        ON CONFLICT (event_date) DO UPDATE
+            SET on_sale_at = coalesce(summary.on_sale_at, EXCLUDED.on_sale_at),
+                sold_out_at = coalesce(summary.sold_out_at, EXCLUDED.sold_out_at)
+    )
+    SELECT event_date, teams, status, inserted FROM changed
+"""
+INSERT_HELD_QUERY = """
+    INSERT INTO {held} (event_date, teams, status)
+    {rows}
+    ON CONFLICT (event_date, teams, status) DO NOTHING
+    RETURNING event_date, teams, status
+"""
+RECIPIENTS_QUERY = """
+    SELECT email, teams, statuses FROM email
+    WHERE (teams IS NULL OR teams && {teams}::text[])
+      AND (statuses IS NULL OR statuses && {statuses}::text[])
+      AND email > {after}
+    ORDER BY email
+"""
+
+
+@contextmanager
+def db_call(name):
+    """Borrow a pooled connection and record how long the call held it."""
+    with DB_CALL_SECONDS.time(call=name), get_connection() as connection:
+        yield connection
+
+
+def load_previous_data(target=DEFAULT_TARGET):
     """Fetch previous event data from the database."""
-    connection = connect_to_db()
-    if not connection:
-        print("Error: Unable to connect to the database.")
+    try:
+        with db_call('load_previous_data') as connection, connection.cursor() as cursor:
+            cursor.execute(sql.SQL("SELECT id, event_date, teams, status FROM {}").format(
+                sql.Identifier(target.events_table)))
+            rows = cursor.fetchall()
+    except psycopg2.Error as e:
+        FAILURES.inc(kind='db')
+        print(f"Error: Unable to load previous data: {e}")
         return {}
 
-    cursor = connection.cursor()
-    cursor.execute("SELECT id, event_date, teams, status FROM rcb_events")
-    rows = cursor.fetchall()
-
     previous_data = {}
     for row in rows:
         event_id, event_date, teams, status = row
-        date_str = event_date.strftime('%b %d, %Y %I:%M %p')
-        previous_data[date_str] = {
+        previous_data[format_date(event_date)] = {
             "id": event_id,
             "teams": teams,
             "status": status
         }
 
-    cursor.close()
-    connection.close()
     return previous_data
 
 
-def parse_date(date_str):
-    """Parse the date string, trying both formats."""
-    for fmt in ["%a, %b %d, %Y %I:%M %p", "%b %d, %Y %I:%M %p"]:
-        try:
-            return datetime.strptime(date_str, fmt)
-        except ValueError:
-            continue
-    print(f"Error parsing date '{date_str}'.")
-    return None
+def load_snapshot(target=DEFAULT_TARGET):
+    """Return {event key: status}, reading the events table only when the cache is cold."""
+    statuses = target.cache.get_snapshot()
+    if statuses is not None:
+        return statuses
+
+    try:
+        with db_call('load_snapshot') as connection, connection.cursor() as cursor:
+            cursor.execute(sql.SQL(SNAPSHOT_QUERY).format(events=sql.Identifier(target.events_table)))
+            rows = cursor.fetchall()
+    except psycopg2.Error as e:
+        FAILURES.inc(kind='db')
+        print(f"Error: Unable to load previous data: {e}")
+        return {}
+
+    return _cache_snapshot(target, rows)
+
+
+def _cache_snapshot(target, rows):
+    statuses = {event_key(event_date): status for event_date, status in rows}
+    target.cache.put_snapshot(statuses)
+    return statuses
+
+
+def load_held_signatures(target=DEFAULT_TARGET):
+    """Return the held signatures, reading the held table only when the cache is cold."""
+    signatures = target.cache.get_held()
+    if signatures is not None:
+        return signatures
+
+    try:
+        with db_call('load_held_signatures') as connection, connection.cursor() as cursor:
+            cursor.execute(sql.SQL(HELD_QUERY).format(held=sql.Identifier(target.held_table)))
+            rows = cursor.fetchall()
+    except psycopg2.Error as e:
+        FAILURES.inc(kind='db')
+        print(f"Error: Unable to load held events: {e}")
+        return set()
+
+    return _cache_held(target, rows)
 
 
-def save_current_data(new_data):
-    """Insert or update the event data if it differs."""
-    previous_data = load_previous_data()
+def _cache_held(target, rows):
+    signatures = {held_signature(*row) for row in rows}
+    target.cache.put_held(signatures)
+    return signatures
 
+
+def save_current_data(new_data, target=DEFAULT_TARGET):
+    """Insert or update the event data if it differs, in one statement.
+
+    The same statement appends every inserted or changed row to the target's
+    status history and records first on-sale and sold-out times in its status
+    summary. Returns those rows, or None if the write failed.
+    """
     if not new_data:
         print("\n📁 No new data to save.")
-        return
+        return []
+
+    rows = _event_rows(new_data)
+    # Diff against the cached snapshot so unchanged events never reach Postgres
+    with stage('diff'):
+        rows = _changed_rows(rows, load_snapshot(target))
+    if not rows:
+        print("\n📁 No event changes to save.")
+        return []
 
     try:
-        connection = connect_to_db()
-        if not connection:
-            print("Error: Unable to connect to the database.")
-            return
-
-        cursor = connection.cursor()
-
-        for event in new_data:
-            date_str = event["date"]
-            event_date = parse_date(date_str)
-            if not event_date:
-                continue
-
-            teams = ", ".join(event["teams"])
-            status = event["status"]
-            formatted_date_str = event_date.strftime('%b %d, %Y %I:%M %p')
-
-            if formatted_date_str in previous_data:
-                existing_event = previous_data[formatted_date_str]
-                if existing_event["status"] != status:
-                    cursor.execute("""
-                        UPDATE rcb_events
-                        SET status = %s
-                        WHERE id = %s
-                    """, (status, existing_event["id"]))
-                    print(f"\n📁 Event for {formatted_date_str} updated.")
-            else:
-                cursor.execute("""
-                    INSERT INTO rcb_events (event_date, teams, status)
-                    VALUES (%s, %s, %s)
-                """, (event_date, event["teams"], status))
-                print(f"\n📁 Event for {formatted_date_str} inserted.")
-
-        connection.commit()
-        cursor.close()
-        connection.close()
+        with stage('db_write'), db_call('save_current_data') as connection, connection.cursor() as cursor:
+            changed = execute_values(cursor, sql.SQL(SAVE_EVENTS_QUERY).format(
+                events=sql.Identifier(target.events_table), history=sql.Identifier(target.history_table),
+                summary=sql.Identifier(target.summary_table), rows=sql.SQL("VALUES %s")),
+                list(rows.values()), template="(%s, %s::text[], %s)", page_size=len(rows), fetch=True)
+            connection.commit()
 
     except Exception as e:
+        FAILURES.inc(kind='db')
         print(f"Error saving the data to the database: {e}")
+        return None
+
+    return _saved_events(target, rows, changed)
+
 
+def _event_rows(new_data):
+    """One (event_date, teams, status) row per event date; ON CONFLICT DO UPDATE cannot touch the same row twice."""
+    rows = {}
+    for event in new_data:
+        if event.event_date:
+            rows[event.event_date] = (event.event_date, list(event.teams), event.status)
+    return rows
 
-def load_held_data():
+
+def _changed_rows(rows, previous):
+    return {date: row for date, row in rows.items() if previous.get(event_key(date)) != row[2]}
+
+
+def _saved_events(target, rows, changed):
+    """Refresh the caches after a successful save and return the changed events for the caller and listeners."""
+    if changed:
+        read_cache.invalidate(target.name, 'events')
+        read_cache.invalidate(target.name, 'sellout')
+    target.cache.update_snapshot({event_key(date): row[2] for date, row in rows.items()})
+
+    changed_events = []
+    for event_date, teams, status, inserted in changed:
+        formatted_date_str = format_date(event_date)
+        print(f"\n📁 Event for {formatted_date_str} {'inserted' if inserted else 'updated'}.")
+        changed_events.append({
+            "date": formatted_date_str,
+            "teams": teams,
+            "status": status,
+            "inserted": inserted
+        })
+    broadcaster.publish(target.name, 'events', changed_events)
+    return changed_events
+
+
+def load_held_data(target=DEFAULT_TARGET):
     """Fetch already held events from the database."""
-    connection = connect_to_db()
-    if not connection:
-        print("Error: Unable to connect to the database.")
+    try:
+        with db_call('load_held_data') as connection, connection.cursor() as cursor:
+            cursor.execute(sql.SQL("SELECT event_date, teams, status FROM {}").format(
+                sql.Identifier(target.held_table)))
+            rows = cursor.fetchall()
+    except psycopg2.Error as e:
+        FAILURES.inc(kind='db')
+        print(f"Error: Unable to load held events: {e}")
         return []
 
-    cursor = connection.cursor()
-    cursor.execute("SELECT event_date, teams, status FROM events_held")
-    rows = cursor.fetchall()
-
     held_events = [{
-        "date": row[0].strftime('%b %d, %Y %I:%M %p'),
+        "date": format_date(row[0]),
         "teams": row[1],
         "status": row[2]
     } for row in rows]
 
-    cursor.close()
-    connection.close()
     return held_events
 
 
+def list_events(target=DEFAULT_TARGET, held=False):
+    """Return the target's events (or held events) ordered by date, for the read API; None if the query failed."""
+    table = target.held_table if held else target.events_table
+    try:
+        with db_call('list_held_events' if held else 'list_events') as connection, connection.cursor() as cursor:
+            cursor.execute(sql.SQL("SELECT event_date, teams, status FROM {} ORDER BY event_date").format(
+                sql.Identifier(table)))
+            rows = cursor.fetchall()
+    except psycopg2.Error as e:
+        FAILURES.inc(kind='db')
+        print(f"Error: Unable to list events from {table}: {e}")
+        return None
+
+    return [{
+        "event_date": event_date,
+        "date": format_date(event_date),
+        "teams": teams,
+        "status": status
+    } for event_date, teams, status in rows]
+
+
+def load_transitions(target=DEFAULT_TARGET, event_date=None, since=None, limit=HISTORY_LIMIT):
+    """Return each event's status changes in order, oldest first; None if the query failed.
+
+    `event_date` narrows it to one event (through the per-event index) and
+    `since` to changes observed after that time (through the BRIN index);
+    with neither, the last HISTORY_WINDOW_DAYS are read. Only the `limit`
+    most recent changes come back, and `previous_status` is None for the
+    first change of each event among them.
+    """
+    if event_date is None and since is None:
+        since = datetime.now(timezone.utc) - timedelta(days=HISTORY_WINDOW_DAYS)
+    try:
+        with db_call('load_transitions') as connection, connection.cursor() as cursor:
+            cursor.execute(sql.SQL("""
+                SELECT event_date, teams, status, observed_at,
+                       lag(status) OVER (PARTITION BY event_date ORDER BY observed_at, id) AS previous_status
+                FROM (
+                    SELECT id, event_date, teams, status, observed_at FROM {history}
+                    WHERE (%(event_date)s::timestamp IS NULL OR event_date = %(event_date)s)
+                      AND (%(since)s::timestamptz IS NULL OR observed_at >= %(since)s)
+                    ORDER BY observed_at DESC, id DESC
+                    LIMIT %(limit)s
+                ) AS recent
+                ORDER BY event_date, observed_at, id
+            """).format(history=sql.Identifier(target.history_table)),
+                {"event_date": event_date, "since": since, "limit": limit})
+            rows = cursor.fetchall()
+    except psycopg2.Error as e:
+        FAILURES.inc(kind='db')
+        print(f"Error: Unable to load status history: {e}")
+        return None
+
+    timelines = {}
+    for event_date, teams, status, observed_at, previous_status in rows:
+        timeline = timelines.setdefault(event_date, {
+            "event_date": event_date, "date": format_date(event_date), "teams": teams, "transitions": []})
+        timeline["transitions"].append(
+            {"status": status, "previous_status": previous_status, "observed_at": observed_at})
+    return list(timelines.values())
+
+
+def load_time_to_sellout(target=DEFAULT_TARGET):
+    """Return, per event, when tickets first went on sale, when it first sold out and the seconds in between.
+
+    Reads the status summary that save_current_data keeps beside the history, one row
+    per event; None if the query failed.
+    """
+    try:
+        with db_call('load_time_to_sellout') as connection, connection.cursor() as cursor:
+            cursor.execute(sql.SQL("""
+                SELECT summary.event_date, events.teams, summary.on_sale_at, summary.sold_out_at
+                FROM {summary} AS summary
+                LEFT JOIN {events} AS events USING (event_date)
+                ORDER BY summary.event_date
+            """).format(summary=sql.Identifier(target.summary_table), events=sql.Identifier(target.events_table)))
+            rows = cursor.fetchall()
+    except psycopg2.Error as e:
+        FAILURES.inc(kind='db')
+        print(f"Error: Unable to load time to sellout: {e}")
+        return None
+
+    return [{
+        "event_date": event_date,
+        "date": format_date(event_date),
+        "teams": teams,
+        "on_sale_at": on_sale_at,
+        "sold_out_at": sold_out_at,
+        "seconds_to_sellout": (sold_out_at - on_sale_at).total_seconds()
+        if on_sale_at and sold_out_at and sold_out_at >= on_sale_at else None
+    } for event_date, teams, on_sale_at, sold_out_at in rows]
+
+
 def get_emails():
-    connection = connect_to_db()
-    if not connection:
-        print("Error: Unable to connect to the database.")
+    try:
+        with db_call('get_emails') as connection, connection.cursor() as cursor:
+            cursor.execute("SELECT email FROM email")  # Select only the 'email' column
+            rows = cursor.fetchall()
+    except psycopg2.Error as e:
+        FAILURES.inc(kind='db')
+        print(f"Error: Unable to load subscriber emails: {e}")
         return []
 
-    cursor = connection.cursor()
-    cursor.execute("SELECT email FROM email")  # Select only the 'email' column
-    rows = cursor.fetchall()
-
     # Extract emails from the tuples
     emails = [row[0] for row in rows]
 
-    cursor.close()
-    connection.close()
     return emails
 
 
-def find_new_status_events(events):
-    """Find and insert new events whose status is not 'COMING SOON' or 'SOLD OUT'."""
-    already_held = load_held_data()
-    held_event_signatures = {
-        (e['date'], tuple(e['teams']), e['status']) for e in already_held
-    }
-
-    new_events = [
-        e for e in events if e['status'] not in ["COMING SOON", "SOLD OUT"] and
-        (e['date'], tuple(e['teams']), e['status']) not in held_event_signatures
-    ]
-
-    if new_events:
-        try:
-            connection = connect_to_db()
-            if not connection:
-                print("Error: Unable to connect to the database.")
-                return
-
-            cursor = connection.cursor()
-            for event in new_events:
-                event_date = parse_date(event["date"])
-                if event_date:
-                    teams = ", ".join(event["teams"])
-                    status = event["status"]
-
-                    cursor.execute("""
-                        INSERT INTO events_held (event_date, teams, status)
-                        VALUES (%s, %s, %s)
-                    """, (event_date, event["teams"], status))
-                    print(
-                        f"\n📁 Event for {event['date']} inserted into events_held.")
+def _matches(preference, values):
+    return preference is None or not preference.isdisjoint(values)
 
+
+def _recipient_filters(events):
+    """The teams and statuses of `events`, to narrow the subscriber query with."""
+    return sorted({team for event in events for team in event.teams}), sorted({event.status for event in events})
+
+
+def _recipient_chunk(events, rows):
+    """Pair each subscriber row with the positions of the events it wants; drop subscribers with none."""
+    chunk = []
+    for email, wanted_teams, wanted_statuses in rows:
+        wanted_teams = set(wanted_teams) if wanted_teams is not None else None
+        wanted_statuses = set(wanted_statuses) if wanted_statuses is not None else None
+        indexes = tuple(
+            i for i, event in enumerate(events)
+            if _matches(wanted_teams, event.teams) and _matches(wanted_statuses, [event.status]))
+        if indexes:
+            chunk.append((email, indexes))
+    return chunk
+
+
+def iter_alert_recipients(events, chunk_size=SUBSCRIBER_CHUNK_SIZE, after=None):
+    """Stream subscribers interested in any of the events, in chunks.
+
+    Yields lists of (email, indexes) pairs in email order, starting after the
+    email `after`, where indexes are the positions in `events` that match the
+    subscriber's team and status preferences. The server-side cursor keeps at
+    most one chunk in memory. A database error is raised once the chunks read
+    so far have been yielded, so the caller can tell it from the end of the list.
+    """
+    try:
+        with get_connection() as connection:
+            # A named cursor is declared on the server and fetched chunk by chunk
+            with connection.cursor(name='alert_recipients') as cursor:
+                cursor.itersize = chunk_size
+                with DB_CALL_SECONDS.time(call='iter_alert_recipients'):
+                    cursor.execute(RECIPIENTS_QUERY.format(teams='%s', statuses='%s', after='%s'),
+                                   (*_recipient_filters(events), after or ''))
+
+                while True:
+                    with DB_CALL_SECONDS.time(call='iter_alert_recipients'):
+                        rows = cursor.fetchmany(chunk_size)
+                    if not rows:
+                        break
+                    yield _recipient_chunk(events, rows)
+    except psycopg2.Error as e:
+        FAILURES.inc(kind='db')
+        print(f"Error: Unable to load subscriber emails: {e}")
+        raise
+
+
+def find_new_status_events(events, target=DEFAULT_TARGET):
+    """Find and insert new events whose status is not 'COMING SOON' or 'SOLD OUT'.
+
+    The insert skips signatures already in the target's held table, so only events that
+    were actually added come back, even when two runs overlap. Returns None
+    if the insert failed.
+    """
+    candidates = _held_candidates(events)
+    # Signatures already alerted on never need another insert attempt
+    with stage('diff'):
+        candidates = _unheld(candidates, load_held_signatures(target))
+
+    if not candidates:
+        print("\nNo new events to add.")
+        return []
+
+    try:
+        with stage('db_write'), db_call('find_new_status_events') as connection, connection.cursor() as cursor:
+            inserted = execute_values(cursor, sql.SQL(INSERT_HELD_QUERY).format(
+                held=sql.Identifier(target.held_table), rows=sql.SQL("VALUES %s")),
+                [(key[0], list(key[1]), key[2]) for key in candidates],
+                template="(%s, %s::text[], %s)", page_size=len(candidates), fetch=True)
             connection.commit()
-            cursor.close()
-            connection.close()
-            return new_events
 
-        except Exception as e:
-            print(f"Error saving the data to the database: {e}")
-    else:
+    except Exception as e:
+        FAILURES.inc(kind='db')
+        print(f"Error saving the data to the database: {e}")
+        return None
+
+    return _held_events(target, candidates, inserted)
+
+
+def _held_candidates(events):
+    """Events with tickets on sale, one per (date, teams, status) key."""
+    candidates = {}
+    for event in events:
+        if event.status in ["COMING SOON", "SOLD OUT"] or not event.event_date:
+            continue
+        candidates.setdefault(event.key, event)
+    return candidates
+
+
+def _unheld(candidates, held):
+    return {key: event for key, event in candidates.items() if held_signature(*key) not in held}
+
+
+def _held_events(target, candidates, inserted):
+    """Refresh the caches after a successful insert and return the events that were actually added."""
+    if inserted:
+        read_cache.invalidate(target.name, 'held')
+    # Rows skipped by ON CONFLICT were already held too
+    target.cache.add_held([held_signature(*key) for key in candidates])
+
+    new_events = []
+    for event_date, teams, status in inserted:
+        event = candidates[(event_date, tuple(teams), status)]
+        print(f"\n📁 Event for {event.date} inserted into {target.held_table}.")
+        new_events.append(event)
+
+    if not new_events:
         print("\nNo new events to add.")
+    broadcaster.publish(target.name, 'held', [event.as_dict() for event in new_events])
+    return new_events
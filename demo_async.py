@@ -0,0 +1,143 @@
+"""Async counterparts of the demo.py queries, on the asyncpg pool in db_async.
+
+They run the same statements and shape rows with the same helpers as their
+demo.py namesakes, so the async pipeline can be swapped in and timed against
+the synchronous one. Snapshot cache, read cache and broadcaster calls block on
+Redis, so they run in worker threads rather than on the shared event loop.
+The writes take the snapshots already loaded and leave stage timing to the
+caller, which runs them side by side.
+"""
+import asyncio
+import json
+
+import asyncpg
+
+from db_async import connection, count_round_trip
+from demo import (HELD_QUERY, INSERT_HELD_QUERY, RECIPIENTS_QUERY, SAVE_EVENTS_QUERY, SNAPSHOT_QUERY,
+                  SUBSCRIBER_CHUNK_SIZE, _cache_held, _cache_snapshot, _changed_rows, _event_rows,
+                  _held_candidates, _held_events, _recipient_chunk, _recipient_filters, _saved_events, _unheld)
+from metrics import DB_CALL_SECONDS, FAILURES
+from targets import DEFAULT_TARGET
+
+# Rows travel as one JSON array per statement, so a whole batch costs a single round trip
+ROWS_FROM_JSON = """
+    SELECT (item->>0)::timestamp, ARRAY(SELECT jsonb_array_elements_text(item->1)), item->>2
+    FROM jsonb_array_elements($1::jsonb) AS item
+"""
+
+
+def _ident(name):
+    return '"' + name.replace('"', '""') + '"'
+
+
+def _rows_json(rows):
+    return json.dumps([[event_date.isoformat(), list(teams), status] for event_date, teams, status in rows])
+
+
+async def fetch(call, query, *args):
+    """Run one query on a pooled connection, timed as `call`."""
+    with DB_CALL_SECONDS.time(call=call):
+        async with connection() as conn:
+            count_round_trip()
+            return await conn.fetch(query, *args)
+
+
+async def load_snapshot(target=DEFAULT_TARGET):
+    """Return {event key: status}, reading the events table only when the cache is cold."""
+    statuses = await asyncio.to_thread(target.cache.get_snapshot)
+    if statuses is not None:
+        return statuses
+
+    try:
+        rows = await fetch('load_snapshot', SNAPSHOT_QUERY.format(events=_ident(target.events_table)))
+    except (asyncpg.PostgresError, OSError) as e:
+        FAILURES.inc(kind='db')
+        print(f"Error: Unable to load previous data: {e}")
+        return {}
+
+    return await asyncio.to_thread(_cache_snapshot, target, rows)
+
+
+async def load_held_signatures(target=DEFAULT_TARGET):
+    """Return the held signatures, reading the held table only when the cache is cold."""
+    signatures = await asyncio.to_thread(target.cache.get_held)
+    if signatures is not None:
+        return signatures
+
+    try:
+        rows = await fetch('load_held_signatures', HELD_QUERY.format(held=_ident(target.held_table)))
+    except (asyncpg.PostgresError, OSError) as e:
+        FAILURES.inc(kind='db')
+        print(f"Error: Unable to load held events: {e}")
+        return set()
+
+    return await asyncio.to_thread(_cache_held, target, rows)
+
+
+async def save_current_data(new_data, snapshot, target=DEFAULT_TARGET):
+    """Insert or update the events that differ from `snapshot` (from load_snapshot); see demo.save_current_data."""
+    if not new_data:
+        print("\n📁 No new data to save.")
+        return []
+
+    rows = _changed_rows(_event_rows(new_data), snapshot)
+    if not rows:
+        print("\n📁 No event changes to save.")
+        return []
+
+    try:
+        changed = await fetch('save_current_data', SAVE_EVENTS_QUERY.format(
+            events=_ident(target.events_table), history=_ident(target.history_table),
+            summary=_ident(target.summary_table), rows=ROWS_FROM_JSON),
+            _rows_json(rows.values()))
+
+    except Exception as e:
+        FAILURES.inc(kind='db')
+        print(f"Error saving the data to the database: {e}")
+        return None
+
+    return await asyncio.to_thread(_saved_events, target, rows, changed)
+
+
+async def iter_alert_recipients(events, chunk_size=SUBSCRIBER_CHUNK_SIZE, after=None):
+    """Stream subscribers interested in any of the events, in chunks; see demo.iter_alert_recipients."""
+    try:
+        async with connection() as conn, conn.transaction():
+            # Server-side cursors only live inside a transaction
+            with DB_CALL_SECONDS.time(call='iter_alert_recipients'):
+                count_round_trip()
+                cursor = await conn.cursor(
+                    RECIPIENTS_QUERY.format(teams='$1', statuses='$2', after='$3'), *_recipient_filters(events),
+                    after or '')
+
+            while True:
+                with DB_CALL_SECONDS.time(call='iter_alert_recipients'):
+                    count_round_trip()
+                    rows = await cursor.fetch(chunk_size)
+                if not rows:
+                    break
+                yield _recipient_chunk(events, rows)
+    except (asyncpg.PostgresError, OSError) as e:
+        FAILURES.inc(kind='db')
+        print(f"Error: Unable to load subscriber emails: {e}")
+        raise
+
+
+async def find_new_status_events(events, held, target=DEFAULT_TARGET):
+    """Insert on-sale events not in `held` (from load_held_signatures); see demo.find_new_status_events."""
+    candidates = _unheld(_held_candidates(events), held)
+
+    if not candidates:
+        print("\nNo new events to add.")
+        return []
+
+    try:
+        inserted = await fetch('find_new_status_events', INSERT_HELD_QUERY.format(
+            held=_ident(target.held_table), rows=ROWS_FROM_JSON), _rows_json(candidates))
+
+    except Exception as e:
+        FAILURES.inc(kind='db')
+        print(f"Error saving the data to the database: {e}")
+        return None
+
+    return await asyncio.to_thread(_held_events, target, candidates, inserted)
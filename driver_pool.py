@@ -0,0 +1,259 @@
+import atexit
+import os
+import queue
+import threading
+import time
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+from metrics import DRIVER_ACQUIRE_SECONDS, FAILURES
+
+# Load environment variables from the .env file
+load_dotenv()
+
+# 0 keeps one driver per target that may need a browser, up to TARGET_CONCURRENCY
+POOL_SIZE = int(os.getenv('DRIVER_POOL_SIZE', 0))
+MAX_USES = int(os.getenv('DRIVER_MAX_USES', 50))  # Recycle a driver after this many runs
+ACQUIRE_TIMEOUT = float(os.getenv('DRIVER_ACQUIRE_TIMEOUT', 60))
+# 'network' reads events from the storefront's XHR traffic, 'dom' parses the rendered page
+BROWSER_EXTRACTION = os.getenv('BROWSER_EXTRACTION', 'dom')
+# 'lean' skips everything the scraper does not read, 'full' loads the shop like a normal visitor
+SCRAPE_PROFILE = os.getenv('SCRAPE_PROFILE', 'lean')
+# A chromedriver binary to use as is; otherwise one is resolved once and remembered in CHROMEDRIVER_CACHE
+CHROMEDRIVER_PATH = os.getenv('CHROMEDRIVER_PATH')
+CHROMEDRIVER_CACHE = os.getenv('CHROMEDRIVER_CACHE', os.path.join(
+    os.path.expanduser('~'), '.cache', 'rcb', 'chromedriver-path'))
+PAGE_LOAD_TIMEOUT = float(os.getenv('SCRAPE_PAGE_LOAD_TIMEOUT', 30))
+# Hosts the lean profile may reach; every other host fails DNS resolution
+ALLOWED_HOSTS = [host.strip() for host in os.getenv(
+    'SCRAPE_ALLOWED_HOSTS', 'shop.royalchallengers.com,*.ticketgenie.in').split(',') if host.strip()]
+
+# Fonts and media that get past the content settings
+BLOCKED_URL_PATTERNS = [
+    '*.woff', '*.woff2', '*.ttf', '*.otf', '*.eot',
+    '*.mp4', '*.webm', '*.mp3', '*.m3u8',
+    '*.png', '*.jpg', '*.jpeg', '*.gif', '*.webp', '*.svg', '*.ico',
+]
+
+
+_driver_path = None
+
+
+def chromedriver_path():
+    """Return the chromedriver binary, going to the network at most once per machine.
+
+    CHROMEDRIVER_PATH pins the binary. Otherwise the path webdriver_manager
+    downloaded is written to CHROMEDRIVER_CACHE and reused while the file
+    exists, so later starts work offline; delete the cache file to upgrade.
+    """
+    global _driver_path
+    if _driver_path is not None:
+        return _driver_path
+    if CHROMEDRIVER_PATH:
+        _driver_path = CHROMEDRIVER_PATH
+        return _driver_path
+
+    try:
+        with open(CHROMEDRIVER_CACHE, encoding='utf-8') as f:
+            cached = f.read().strip()
+        if cached and os.path.isfile(cached):
+            _driver_path = cached
+            return _driver_path
+    except OSError:
+        pass
+
+    from webdriver_manager.chrome import ChromeDriverManager
+
+    _driver_path = ChromeDriverManager().install()
+    try:
+        os.makedirs(os.path.dirname(CHROMEDRIVER_CACHE), exist_ok=True)
+        with open(CHROMEDRIVER_CACHE, 'w', encoding='utf-8') as f:
+            f.write(_driver_path)
+    except OSError as e:
+        print(f"⚠️ Could not cache the chromedriver path: {e}")
+    return _driver_path
+
+
+def create_driver(profile=None, performance_log=None):
+    from selenium import webdriver
+    from selenium.webdriver.chrome.options import Options
+    from selenium.webdriver.chrome.service import Service
+
+    profile = profile or SCRAPE_PROFILE
+    if performance_log is None:
+        performance_log = BROWSER_EXTRACTION == 'network'
+
+    options = Options()
+    options.add_argument('--headless')
+    options.add_argument('--no-sandbox')
+    options.add_argument('--disable-dev-shm-usage')
+    if performance_log:
+        # Expose DevTools network events through driver.get_log('performance')
+        options.set_capability('goog:loggingPrefs', {'performance': 'ALL'})
+
+    if profile == 'lean':
+        # Return from driver.get() at DOMContentLoaded instead of waiting for every subresource
+        options.page_load_strategy = 'eager'
+        options.add_argument('--blink-settings=imagesEnabled=false')
+        options.add_argument('--mute-audio')
+        options.add_argument('--disable-extensions')
+        options.add_argument('--disable-background-networking')
+        options.add_experimental_option('prefs', {
+            'profile.managed_default_content_settings.images': 2,
+            'profile.managed_default_content_settings.media_stream': 2,
+            'profile.managed_default_content_settings.notifications': 2,
+        })
+        if ALLOWED_HOSTS:
+            # Analytics, chat widgets and CDNs outside the allow-list never connect
+            exclusions = ', '.join(f'EXCLUDE {host}' for host in ALLOWED_HOSTS)
+            options.add_argument(f'--host-resolver-rules=MAP * ~NOTFOUND, {exclusions}')
+
+    driver = webdriver.Chrome(service=Service(chromedriver_path()), options=options)
+    driver.set_page_load_timeout(PAGE_LOAD_TIMEOUT)
+
+    if profile == 'lean':
+        driver.execute_cdp_cmd('Network.enable', {})
+        driver.execute_cdp_cmd('Network.setBlockedURLs', {'urls': BLOCKED_URL_PATTERNS})
+
+    return driver
+
+
+def browser_pool_size():
+    """Drivers needed for every target that may use a browser to scrape at once."""
+    from scraper import SCRAPE_MODE
+    from targets import TARGET_CONCURRENCY, TARGETS
+
+    if SCRAPE_MODE == 'http':
+        return 1  # Never used
+    # In auto mode any target can fall back to the browser
+    return max(1, min(len(TARGETS), TARGET_CONCURRENCY))
+
+
+class DriverPool:
+    """Bounded pool of long-lived headless Chrome drivers.
+
+    Without a size the pool is sized by browser_pool_size() on first use, so
+    targets scraped side by side do not queue for a single driver.
+    """
+
+    def __init__(self, size=POOL_SIZE, max_uses=MAX_USES, factory=create_driver):
+        self.size = size or None
+        self.max_uses = max_uses
+        self.factory = factory
+        self._idle = queue.LifoQueue()  # Hand out the most recently used (warmest) driver first
+        self._slots = None
+        self._uses = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def start(self):
+        """Launch drivers until the pool is full, so the first run starts warm."""
+        self._sized()
+        with self._lock:
+            self._closed = False
+        while self._idle.qsize() < self.size:
+            try:
+                self._idle.put(self._launch())
+            except Exception as e:
+                print(f"❌ Failed to warm the driver pool: {e}")
+                break
+
+    @contextmanager
+    def driver(self, timeout=ACQUIRE_TIMEOUT):
+        """Check out a healthy driver and return it to the pool afterwards."""
+        started = time.perf_counter()
+        slots = self._sized()
+        if not slots.acquire(timeout=timeout):
+            FAILURES.inc(kind='driver_acquire')
+            raise TimeoutError("Timed out waiting for a free browser driver.")
+        driver = None
+        try:
+            driver = self._checkout()
+            DRIVER_ACQUIRE_SECONDS.observe(time.perf_counter() - started)
+            yield driver
+        finally:
+            if driver is not None:
+                self._checkin(driver)
+            slots.release()
+
+    def close(self):
+        """Quit every idle driver; drivers still checked out are quit on return."""
+        with self._lock:
+            self._closed = True
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._quit(driver)
+
+    def _sized(self):
+        """Return the pool's slots, sizing the pool on first use."""
+        with self._lock:
+            if self._slots is None:
+                needed = browser_pool_size()
+                if self.size is None:
+                    self.size = needed
+                elif self.size < needed:
+                    print(f"⚠️ DRIVER_POOL_SIZE={self.size} is below the {needed} targets that may scrape "
+                          f"with a browser at once; they will wait for each other.")
+                self._slots = threading.BoundedSemaphore(self.size)
+            return self._slots
+
+    def _launch(self):
+        driver = self.factory()
+        with self._lock:
+            self._uses[id(driver)] = 0
+        return driver
+
+    def _checkout(self):
+        while True:
+            try:
+                driver = self._idle.get_nowait()
+            except queue.Empty:
+                return self._launch()
+            if self._is_alive(driver):
+                return driver
+            print("♻️ Replacing a crashed browser driver.")
+            self._quit(driver)
+
+    def _checkin(self, driver):
+        from selenium.common.exceptions import WebDriverException
+
+        with self._lock:
+            self._uses[id(driver)] = self._uses.get(id(driver), 0) + 1
+            worn_out = self._uses[id(driver)] >= self.max_uses
+            closed = self._closed
+        if closed or worn_out:
+            self._quit(driver)
+            return
+        try:
+            # Drop the page so an idle driver does not hold on to the shop's DOM
+            driver.get('about:blank')
+        except WebDriverException:
+            self._quit(driver)
+            return
+        self._idle.put(driver)
+
+    def _quit(self, driver):
+        with self._lock:
+            self._uses.pop(id(driver), None)
+        try:
+            driver.quit()
+        except Exception:
+            pass
+
+    @staticmethod
+    def _is_alive(driver):
+        from selenium.common.exceptions import WebDriverException
+
+        try:
+            driver.execute_script('return 1')
+            return True
+        except WebDriverException:
+            return False
+
+
+driver_pool = DriverPool()
+atexit.register(driver_pool.close)
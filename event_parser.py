@@ -0,0 +1,80 @@
+import os
+
+from dotenv import load_dotenv
+
+from events import Event
+
+# Load environment variables from the .env file
+load_dotenv()
+
+# Any BeautifulSoup tree builder; 'lxml' is faster when installed
+EVENT_PARSER = os.getenv('EVENT_PARSER', 'html.parser')
+
+
+def _tag_and_class(selector):
+    """Split a 'tag.class1.class2' selector into find() arguments."""
+    tag, _, classes = selector.partition('.')
+    return tag or None, classes.replace('.', ' ') or None
+
+
+class EventSelectors:
+    """Where a storefront page keeps each event field, as 'tag.class' selectors."""
+
+    def __init__(self, block='div.css-q38j1a', date='div.css-b2t39r', team='p.chakra-text.css-10rvbm3',
+                 special='p.chakra-text.css-vahgqk', status='button'):
+        self.block_css = block
+        self.block = _tag_and_class(block)
+        self.date = _tag_and_class(date)
+        self.team = _tag_and_class(team)
+        self.special = _tag_and_class(special)
+        self.status = _tag_and_class(status)
+        self._strainer = None
+
+    @property
+    def strainer(self):
+        """Only event blocks (and what is inside them) are turned into tree nodes."""
+        if self._strainer is None:
+            from bs4 import SoupStrainer
+            self._strainer = SoupStrainer(self.block[0], class_=self.block[1])
+        return self._strainer
+
+
+DEFAULT_SELECTORS = EventSelectors()
+
+
+def _find(block, selector):
+    tag, class_ = selector
+    return block.find(tag, class_=class_) if class_ else block.find(tag)
+
+
+def parse_events(html, parser=None, selectors=None):
+    """Extract the events from the rendered ticket page.
+
+    The rest of the shop (navigation, merchandise, inline scripts and styles)
+    is tokenized but never built into the tree.
+    """
+    from bs4 import BeautifulSoup
+
+    selectors = selectors or DEFAULT_SELECTORS
+    soup = BeautifulSoup(html, parser or EVENT_PARSER, parse_only=selectors.strainer)
+    events = []
+
+    for block in soup.find_all(selectors.block[0], class_=selectors.block[1]):
+        date_div = _find(block, selectors.date)
+        date_p = date_div.find('p') if date_div else None
+        date = date_p.get_text(strip=True) if date_p else 'N/A'
+
+        teams = [team_p.get_text(strip=True) for team_p in block.find_all(
+            selectors.team[0], class_=selectors.team[1])]
+        # Handle special single-team events (like RCB UNBOX)
+        if not teams:
+            special_event = _find(block, selectors.special)
+            if special_event:
+                teams.append(special_event.get_text(strip=True))
+
+        status_button = _find(block, selectors.status)
+        status = status_button.get_text(strip=True) if status_button else 'N/A'
+
+        events.append(Event(date, teams if teams else ["N/A"], status))
+
+    return events
@@ -0,0 +1,55 @@
+from datetime import datetime
+from functools import lru_cache
+
+PAGE_DATE_FORMAT = "%a, %b %d, %Y %I:%M %p"  # How the ticket page shows dates
+DB_DATE_FORMAT = "%b %d, %Y %I:%M %p"  # How dates read back from Postgres are shown
+
+
+@lru_cache(maxsize=4096)
+def parse_date(date_str):
+    """Parse the date string, trying both formats; a page lists the same few dates on every run."""
+    for fmt in (PAGE_DATE_FORMAT, DB_DATE_FORMAT):
+        try:
+            return datetime.strptime(date_str, fmt)
+        except ValueError:
+            continue
+    print(f"Error parsing date '{date_str}'.")
+    return None
+
+
+def format_date(event_date):
+    return event_date.strftime(DB_DATE_FORMAT)
+
+
+class Event:
+    """One listed match, with its date parsed once.
+
+    `key` is (event_date, teams, status): the identity of a held event, equal
+    whichever format the date was written in. Events compare and hash by it.
+    """
+
+    __slots__ = ('date', 'teams', 'status', 'event_date', 'key')
+
+    def __init__(self, date, teams, status, event_date=None):
+        self.date = date
+        self.teams = tuple(teams)
+        self.status = status
+        self.event_date = event_date if event_date is not None else parse_date(date)
+        self.key = (self.event_date, self.teams, self.status)
+
+    @classmethod
+    def from_row(cls, event_date, teams, status):
+        """Build an event from a database row."""
+        return cls(format_date(event_date), teams, status, event_date)
+
+    def as_dict(self):
+        return {"date": self.date, "teams": list(self.teams), "status": self.status}
+
+    def __eq__(self, other):
+        return isinstance(other, Event) and self.key == other.key
+
+    def __hash__(self):
+        return hash(self.key)
+
+    def __repr__(self):
+        return f'Event({self.date!r}, {list(self.teams)!r}, {self.status!r})'
@@ -0,0 +1,313 @@
+import json
+import multiprocessing
+import os
+import socket
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from dotenv import load_dotenv
+from redis.exceptions import RedisError
+
+import metrics
+from lease import alert_lease
+from redis_client import get_redis
+
+# Load environment variables from the .env file
+load_dotenv()
+
+JOB_WORKERS = int(os.getenv('JOB_WORKERS', 1))  # Local worker processes when REDIS_URL is not set
+JOB_TTL = int(os.getenv('JOB_TTL', 86400))  # Seconds a finished job's record is kept
+JOB_TIMEOUT = float(os.getenv('JOB_TIMEOUT', 600))  # Seconds a trigger waits for its job to finish
+JOB_POLL_INTERVAL = float(os.getenv('JOB_POLL_INTERVAL', 0.5))
+JOB_HEARTBEAT_TTL = int(os.getenv('JOB_HEARTBEAT_TTL', 30))  # Seconds a silent Redis worker keeps its job
+JOB_MAX_ATTEMPTS = int(os.getenv('JOB_MAX_ATTEMPTS', 2))  # Runs of a job whose workers keep dying
+
+FINISHED_STATES = ('done', 'failed')
+
+
+def init_worker():
+    """Warm the browser and database pools once per worker process."""
+    from db_connection import pool as db_pool
+    from driver_pool import driver_pool
+    from scraper import SCRAPE_MODE
+
+    if SCRAPE_MODE != 'http':
+        driver_pool.start()
+    try:
+        db_pool.warm()
+    except Exception as e:
+        print(f"❌ Failed to warm the database pool: {e}")
+
+
+def run_job(job_id, report_stats=False):
+    """Run the alert pipeline for one job; returns the fields to store on its record.
+
+    With report_stats the fields also carry the metrics and lease counts the
+    run recorded in this process, for the API to merge into its own.
+    """
+    import metrics
+    from alerts import mail_alert
+    from lease import alert_lease
+
+    metrics_before, lease_before = metrics.snapshot(), alert_lease.snapshot()
+    fields = {"started_at": time.time(), "worker": worker_name()}
+    print(f"🛠️ Worker {fields['worker']} running job {job_id}.")
+    try:
+        fields.update(state="done", result=mail_alert())
+    except Exception as e:
+        fields.update(state="failed", error=str(e))
+    fields["finished_at"] = time.time()
+    if report_stats:
+        fields.update(metrics=metrics.changes_since(metrics_before),
+                      lease_stats=alert_lease.changes_since(lease_before))
+    return fields
+
+
+def worker_name():
+    return f'{socket.gethostname()}:{os.getpid()}'
+
+
+def job_view(job_id, record):
+    """Shape a job record for the API: state, per-stage timings and the events it detected."""
+    result = record.get("result") or {}
+    return {
+        "job_id": job_id,
+        "state": record.get("state"),
+        "queued_at": record.get("queued_at"),
+        "started_at": record.get("started_at"),
+        "finished_at": record.get("finished_at"),
+        "worker": record.get("worker"),
+        "error": record.get("error"),
+        "errors": result.get("errors"),
+        "timings": result.get("timings", {}),
+        "events": result.get("events", []),
+        "result": result or None,
+    }
+
+
+class LocalJobQueue:
+    """Run jobs on a pool of worker processes owned by this process.
+
+    The metrics and lease counts a job records in its worker are merged into
+    this process when it finishes, so the API's /metrics and /lease cover them.
+    """
+
+    backend = 'local'
+
+    def __init__(self, workers=JOB_WORKERS, ttl=JOB_TTL):
+        self.workers = workers
+        self.ttl = ttl
+        self._jobs = {}  # job id -> (record, future)
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def submit(self, job_id=None):
+        job_id = job_id or uuid.uuid4().hex
+        with self._lock:
+            self._expire()
+            if self._executor is None:
+                # Spawned children start clean instead of inheriting the API's sockets and threads
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context('spawn'),
+                    initializer=init_worker)
+            record = {"state": "queued", "queued_at": time.time()}
+            future = self._executor.submit(run_job, job_id, True)
+            self._jobs[job_id] = (record, future)
+        future.add_done_callback(lambda done: self._finish(job_id, done))
+        return job_id
+
+    def get(self, job_id):
+        with self._lock:
+            entry = self._jobs.get(job_id)
+            if entry is None:
+                return None
+            record, future = entry
+            record = dict(record)
+        if record["state"] == "queued" and future.running():
+            record["state"] = "running"
+        return record
+
+    def wait(self, job_id, timeout=JOB_TIMEOUT):
+        with self._lock:
+            entry = self._jobs.get(job_id)
+        if entry is None:
+            return None
+        try:
+            entry[1].exception(timeout=timeout)
+        except Exception:
+            pass  # Timed out; the caller sees the record as it is
+        return self.get(job_id)
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+    def _finish(self, job_id, future):
+        try:
+            fields = future.result()
+        except Exception as e:  # The worker process died or the job was cancelled
+            fields = {"state": "failed", "finished_at": time.time(), "error": str(e) or type(e).__name__}
+        metrics.merge(fields.pop("metrics", None))
+        alert_lease.merge(fields.pop("lease_stats", None))
+        with self._lock:
+            self._jobs[job_id][0].update(fields)
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        for job_id, (record, _) in list(self._jobs.items()):
+            if record["state"] in FINISHED_STATES and record.get("finished_at", 0) < cutoff:
+                del self._jobs[job_id]
+
+
+class RedisJobQueue:
+    """Jobs in a Redis list, run by `python worker.py` processes on any host.
+
+    Each job is a hash at rcb:job:<id>; its id is pushed on rcb:jobs:queue and
+    moved by exactly one worker to rcb:jobs:processing, where it stays until
+    the job's record is written. While it runs the worker refreshes
+    rcb:job:<id>:heartbeat; reap() requeues jobs whose heartbeat ran out
+    because their worker died, and fails them after JOB_MAX_ATTEMPTS runs.
+    """
+
+    backend = 'redis'
+
+    def __init__(self, client, ttl=JOB_TTL, heartbeat_ttl=JOB_HEARTBEAT_TTL, max_attempts=JOB_MAX_ATTEMPTS):
+        self.client = client
+        self.ttl = ttl
+        self.heartbeat_ttl = heartbeat_ttl
+        self.max_attempts = max_attempts
+        self.queue_key = 'rcb:jobs:queue'
+        self.processing_key = 'rcb:jobs:processing'
+        self._suspects = set()  # Jobs seen without a heartbeat on the previous reap
+
+    def submit(self, job_id=None):
+        job_id = job_id or uuid.uuid4().hex
+        pipe = self.client.pipeline()
+        pipe.hset(self._key(job_id), mapping={"state": "queued", "queued_at": time.time()})
+        pipe.expire(self._key(job_id), self.ttl)
+        pipe.lpush(self.queue_key, job_id)
+        pipe.execute()
+        return job_id
+
+    def get(self, job_id):
+        record = self.client.hgetall(self._key(job_id))
+        if not record:
+            return None
+        for field in ("queued_at", "started_at", "finished_at"):
+            if field in record:
+                record[field] = float(record[field])
+        if "result" in record:
+            record["result"] = json.loads(record["result"])
+        return record
+
+    def wait(self, job_id, timeout=JOB_TIMEOUT):
+        deadline = time.monotonic() + timeout
+        while True:
+            try:
+                record = self.get(job_id)
+            except RedisError as e:
+                print(f"⚠️ Job store unavailable: {e}")
+                record = None
+            if record is None or record["state"] in FINISHED_STATES or time.monotonic() >= deadline:
+                return record
+            time.sleep(JOB_POLL_INTERVAL)
+
+    def work(self, stop=None, block_timeout=5):
+        """Take and run jobs until `stop` is set; used by worker.py."""
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            try:
+                self.reap()
+                job_id = self.client.blmove(self.queue_key, self.processing_key, block_timeout, 'RIGHT', 'LEFT')
+            except RedisError as e:
+                print(f"⚠️ Job queue unavailable: {e}")
+                stop.wait(block_timeout)
+                continue
+            if job_id is not None:
+                self._run(job_id)
+
+    def reap(self):
+        """Requeue jobs whose worker stopped heartbeating; returns the ids handled.
+
+        A job is only reaped when its heartbeat was missing on two passes in a
+        row, so a worker that has just taken a job has time to start beating.
+        """
+        missing = {job_id for job_id in self.client.lrange(self.processing_key, 0, -1)
+                   if not self.client.exists(self._heartbeat_key(job_id))}
+        lost, self._suspects = missing & self._suspects, missing - self._suspects
+        reaped = []
+        for job_id in lost:
+            # LREM succeeds for only one reaper, so a job is never requeued twice
+            if not self.client.lrem(self.processing_key, 1, job_id):
+                continue
+            reaped.append(job_id)
+            key = self._key(job_id)
+            if not self.client.exists(key):
+                continue  # The record already expired; nobody is waiting for it
+            attempts = int(self.client.hget(key, "attempts") or 0)
+            if attempts < self.max_attempts:
+                print(f"♻️ Requeueing job {job_id}: its worker stopped responding.")
+                pipe = self.client.pipeline()
+                pipe.hset(key, "state", "queued")
+                pipe.lpush(self.queue_key, job_id)
+                pipe.execute()
+            else:
+                print(f"❌ Giving up on job {job_id} after {attempts} attempts.")
+                self.client.hset(key, mapping={"state": "failed", "finished_at": time.time(),
+                                               "error": "Worker stopped responding."})
+        return reaped
+
+    def _run(self, job_id):
+        key = self._key(job_id)
+        stop_beating = threading.Event()
+        try:
+            self.client.set(self._heartbeat_key(job_id), worker_name(), ex=self.heartbeat_ttl)
+            pipe = self.client.pipeline()
+            pipe.hset(key, mapping={"state": "running", "started_at": time.time(), "worker": worker_name()})
+            pipe.hincrby(key, "attempts", 1)
+            pipe.execute()
+            threading.Thread(target=self._heartbeat, args=(job_id, stop_beating), daemon=True).start()
+
+            fields = run_job(job_id)
+            if "result" in fields:
+                fields["result"] = json.dumps(fields["result"], default=str)
+            pipe = self.client.pipeline()
+            pipe.hset(key, mapping=fields)
+            pipe.expire(key, self.ttl)
+            pipe.lrem(self.processing_key, 1, job_id)
+            pipe.delete(self._heartbeat_key(job_id))
+            pipe.execute()
+        except RedisError as e:
+            print(f"⚠️ Could not record job {job_id}: {e}")
+        finally:
+            stop_beating.set()
+
+    def _heartbeat(self, job_id, stop):
+        while not stop.wait(self.heartbeat_ttl / 3):
+            try:
+                self.client.set(self._heartbeat_key(job_id), worker_name(), ex=self.heartbeat_ttl)
+            except RedisError as e:
+                print(f"⚠️ Could not refresh the heartbeat of job {job_id}: {e}")
+
+    def close(self):
+        pass
+
+    @staticmethod
+    def _key(job_id):
+        return f'rcb:job:{job_id}'
+
+    @staticmethod
+    def _heartbeat_key(job_id):
+        return f'rcb:job:{job_id}:heartbeat'
+
+
+def create_job_queue():
+    client = get_redis()
+    return RedisJobQueue(client) if client is not None else LocalJobQueue()
+
+
+job_queue = create_job_queue()
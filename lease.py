@@ -0,0 +1,199 @@
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+from redis.exceptions import RedisError
+
+from redis_client import get_redis
+from single_flight import MIN_RUN_INTERVAL
+
+# Load environment variables from the .env file
+load_dotenv()
+
+LEASE_TTL_MS = int(os.getenv('LEASE_TTL_MS', 60000))  # Lease expiry if the holder stops renewing it
+
+# Extend or drop the lease only while we still own it
+RENEW_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    return redis.call('pexpire', KEYS[1], ARGV[2])
+end
+return 0
+"""
+RELEASE_SCRIPT = """
+if redis.call('get', KEYS[1]) == ARGV[1] then
+    if tonumber(ARGV[2]) > 0 then
+        return redis.call('pexpire', KEYS[1], ARGV[2])
+    end
+    return redis.call('del', KEYS[1])
+end
+return 0
+"""
+
+
+class LeaseLost(Exception):
+    """Raised when the lease expired or was taken over while work was in progress."""
+
+
+class LeaseHandle:
+    """A held lease. The token grows with every acquisition across the deployment.
+
+    ensure() is checked before each write; the token is not checked by
+    Postgres, so a holder that stalls inside a write is not fenced off.
+    """
+
+    def __init__(self, token, value, ttl_ms=None):
+        self.token = token
+        self.value = value
+        self.valid = True
+        self.ttl_ms = ttl_ms
+        self.renewed_at = time.monotonic()
+
+    def expired(self):
+        """True once ttl_ms has passed since the last successful renewal."""
+        return self.ttl_ms is not None and (time.monotonic() - self.renewed_at) * 1000 >= self.ttl_ms
+
+    def ensure(self):
+        if not self.valid or self.expired():
+            raise LeaseLost(f"Lease {self.token} is no longer held.")
+
+
+class _LeaseStats:
+
+    def __init__(self):
+        self._stats_lock = threading.Lock()
+        self.counters = {"acquired": 0, "contended": 0, "expired": 0, "released": 0}
+
+    def count(self, name):
+        with self._stats_lock:
+            self.counters[name] += 1
+
+    def snapshot(self):
+        with self._stats_lock:
+            return dict(self.counters)
+
+    def changes_since(self, before):
+        """Counter increments since snapshot() returned `before`."""
+        return {name: value - before.get(name, 0) for name, value in self.snapshot().items()
+                if value != before.get(name, 0)}
+
+    def merge(self, changes):
+        """Add counts from a worker process's lease to this process's figures."""
+        with self._stats_lock:
+            for name, value in (changes or {}).items():
+                self.counters[name] = self.counters.get(name, 0) + value
+
+
+class RedisLease(_LeaseStats):
+    """Deployment-wide lease: SET NX PX with an increasing token, renewed while held.
+
+    On release the key is kept for `cooldown_ms` so no other worker starts a
+    new run inside the same window.
+    """
+
+    def __init__(self, client, name='alert', ttl_ms=LEASE_TTL_MS, cooldown_ms=int(MIN_RUN_INTERVAL * 1000)):
+        super().__init__()
+        self.client = client
+        self.key = f'rcb:lease:{name}'
+        self.token_key = f'rcb:lease:{name}:token'
+        self.ttl_ms = ttl_ms
+        self.cooldown_ms = cooldown_ms
+        self._renew = client.register_script(RENEW_SCRIPT)
+        self._release = client.register_script(RELEASE_SCRIPT)
+
+    @contextmanager
+    def hold(self):
+        """Yield a LeaseHandle, or None when another worker holds the lease."""
+        handle = self._acquire()
+        if handle is None:
+            yield None
+            return
+
+        stop = threading.Event()
+        renewer = threading.Thread(target=self._keep_alive, args=(handle, stop), daemon=True)
+        renewer.start()
+        try:
+            yield handle
+        finally:
+            stop.set()
+            renewer.join()
+            try:
+                self._release(keys=[self.key], args=[handle.value, self.cooldown_ms])
+                self.count("released")
+            except RedisError as e:
+                print(f"⚠️ Failed to release the lease: {e}")
+
+    def stats(self):
+        try:
+            holder = self.client.get(self.key)
+        except RedisError:
+            holder = None
+        return dict(self.snapshot(), backend='redis', holder=holder)
+
+    def _acquire(self):
+        try:
+            token = self.client.incr(self.token_key)
+            value = f'{token}:{uuid.uuid4().hex}'
+            if not self.client.set(self.key, value, nx=True, px=self.ttl_ms):
+                self.count("contended")
+                return None
+        except RedisError as e:
+            print(f"⚠️ Lease backend unavailable: {e}")
+            self.count("contended")
+            return None
+        self.count("acquired")
+        return LeaseHandle(token, value, self.ttl_ms)
+
+    def _keep_alive(self, handle, stop):
+        while not stop.wait(self.ttl_ms / 3000):
+            started = time.monotonic()
+            try:
+                renewed = self._renew(keys=[self.key], args=[handle.value, self.ttl_ms])
+            except RedisError as e:
+                print(f"⚠️ Failed to renew the lease: {e}")
+                # Redis may already have let the key expire; past the TTL another worker can hold it
+                if not handle.expired():
+                    continue
+                renewed = False
+            if not renewed:
+                handle.valid = False
+                self.count("expired")
+                print(f"⚠️ Lease {handle.token} expired while the run was in progress.")
+                return
+            handle.renewed_at = started
+
+
+class LocalLease(_LeaseStats):
+    """Single-process stand-in with the same interface, used when REDIS_URL is not set."""
+
+    def __init__(self):
+        super().__init__()
+        self._lock = threading.Lock()
+        self._token = 0
+
+    @contextmanager
+    def hold(self):
+        if not self._lock.acquire(blocking=False):
+            self.count("contended")
+            yield None
+            return
+        self._token += 1
+        self.count("acquired")
+        try:
+            yield LeaseHandle(self._token, str(self._token))
+        finally:
+            self._lock.release()
+            self.count("released")
+
+    def stats(self):
+        return dict(self.snapshot(), backend='local', holder=str(self._token) if self._lock.locked() else None)
+
+
+def create_lease(name='alert'):
+    client = get_redis()
+    return RedisLease(client, name=name) if client is not None else LocalLease()
+
+
+alert_lease = create_lease()
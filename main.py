@@ -1,197 +1,73 @@
-from fastapi.responses import JSONResponse
-from demo import save_current_data, find_new_status_events, get_emails
-from webdriver_manager.chrome import ChromeDriverManager
-from selenium.webdriver.support import expected_conditions as EC
-from selenium.webdriver.support.ui import WebDriverWait
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.common.by import By
-from selenium import webdriver
-from email.mime.text import MIMEText
-import smtplib
+from fastapi.responses import JSONResponse, PlainTextResponse, Response, StreamingResponse
+from db_connection import pool as db_pool
+from migrate import check_schema
+from single_flight import SingleFlight
+from lease import alert_lease
+from alerts import record_run
+from jobs import job_queue, job_view
+from read_cache import read_cache
+from broadcast import broadcaster
+from demo import HISTORY_LIMIT, list_events, load_time_to_sellout, load_transitions
+from targets import DEFAULT_TARGET, TARGETS
+import metrics
+from scheduler import SCHEDULER_ENABLED, AdaptivePoller
+from starlette.concurrency import run_in_threadpool
+from contextlib import asynccontextmanager
 from fastapi.responses import HTMLResponse
 from fastapi.middleware.cors import CORSMiddleware
-from bs4 import BeautifulSoup
-from fastapi import FastAPI, BackgroundTasks
+from fastapi import FastAPI, HTTPException, Query, Request, WebSocket, WebSocketDisconnect
 from dotenv import load_dotenv
-import os
+from datetime import datetime
+import asyncio
+import sys
 
 # Load environment variables from the .env file
 load_dotenv()
 
-smtp_host = os.getenv('EMAIL_HOST')
-smtp_port = int(os.getenv('EMAIL_PORT'))
-username = os.getenv('EMAIL_USER')
-password = os.getenv('EMAIL_PASS')
 
+def run_alert_job(job_id):
+    """Queue an alert job for the worker processes and wait for its result."""
+    try:
+        job_queue.submit(job_id)
+        record = job_queue.wait(job_id) or {}
+    except Exception as e:
+        record = {"state": "failed", "error": str(e)}
+    result = record.get("result")
+    if record.get("state") != "done":
+        print(f"❌ Alert job {job_id} did not finish: {record.get('error') or record.get('state')}")
+    record_run(result)
+    read_cache.invalidate_result(result)
+    broadcaster.publish_result(result)
+    return result
 
-def create_driver():
-    options = Options()
-    options.add_argument('--headless')
-    options.add_argument('--no-sandbox')
-    options.add_argument('--disable-dev-shm-usage')
-    return webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
 
+# Concurrent triggers share one in-flight job instead of each queueing a scrape
+alert_flight = SingleFlight(run_alert_job)
+poller = AdaptivePoller(alert_flight)
 
-def mail_alert():
-    driver = create_driver()
-    try:
-        url = 'https://shop.royalchallengers.com/ticket'
-        driver.get(url)
-
-        # Wait for the page to load
-        wait = WebDriverWait(driver, 15)
-        wait.until(EC.presence_of_element_located((By.ID, 'rcb-shop')))
-
-        # Parse the loaded page with BeautifulSoup
-        soup = BeautifulSoup(driver.page_source, 'html.parser')
-        new_events = []
-        event_blocks = soup.find_all('div', class_='css-q38j1a')
-
-        for block in event_blocks:
-            date_div = block.find('div', class_='css-b2t39r')
-            date = date_div.find('p').get_text(
-                strip=True) if date_div and date_div.find('p') else 'N/A'
-
-            teams = [team_div.get_text(strip=True) for team_div in block.find_all(
-                'p', class_='chakra-text css-10rvbm3')]
-            if not teams:
-                special_event = block.find(
-                    'p', class_='chakra-text css-vahgqk')
-                if special_event:
-                    teams.append(special_event.get_text(strip=True))
-
-            status_button = block.find('button')
-            status = status_button.get_text(
-                strip=True) if status_button else 'N/A'
-
-            event_info = {
-                "date": date,
-                "teams": teams if teams else ["N/A"],
-                "status": status
-            }
-            new_events.append(event_info)
-
-        new_status_events = find_new_status_events(new_events)
-
-        if new_status_events:
-            print("\n🚨 ALERT! New events with active tickets detected:\n")
-
-            # Prepare the responsive HTML email body
-            email_body = """
-            <html>
-            <head>
-                <meta name="viewport" content="width=device-width, initial-scale=1.0">
-                <style>
-                    @media only screen and (max-width: 600px) {
-                        .container {
-                            padding: 20px !important;
-                        }
-                        .table-header, .table-cell {
-                            display: block;
-                            width: 100% !important;
-                            text-align: left !important;
-                        }
-                        .cta-button {
-                            padding: 12px 20px !important;
-                            font-size: 16px !important;
-                        }
-                        .header-text {
-                            font-size: 24px !important;
-                        }
-                        .sub-text {
-                            font-size: 16px !important;
-                        }
-                    }
-                </style>
-            </head>
-            <body style="font-family: 'Helvetica Neue', Arial, sans-serif; background-color: #f7f9fc; padding: 50px;">
-                <div class="container" style="background-color: #ffffff; padding: 40px; border-radius: 12px; border: 1px solid #e5e5e5; box-shadow: 0 10px 20px rgba(0, 0, 0, 0.05); max-width: 650px; margin: auto;">
-                    
-                    <!-- Header -->
-                    <div style="text-align: center; margin-bottom: 30px;">
-                        <img src="https://shop.royalchallengers.com/imgs/rcb-logo-new.png" alt="RCB Logo" style="max-width: 150px; height: auto;">
-                        <h2 class="header-text" style="color: #d6336c; font-size: 32px; margin-top: 20px; font-weight: 600;">🚨 New Ticket Alert! 🚨</h2>
-                        <p class="sub-text" style="font-size: 18px; color: #555555; line-height: 1.6; max-width: 500px; margin: auto;">Get ready for the next RCB match! Below are the latest updates on ticket availability for upcoming events.</p>
-                    </div>
-                <div style="text-align: center; margin-top: 30px;">
-                        <a href="https://shop.royalchallengers.com/ticket" 
-                        class="cta-button" 
-                        style="background-color: #d6336c; color: white; padding: 15px 30px; font-size: 18px; font-weight: 600; border-radius: 8px; text-decoration: none; display: inline-block;">
-                            Grab Your Tickets Now! 🎟️
-                        </a>
-                    </div>
-                    <!-- Table -->
-                    <table style="width: 100%; border-collapse: collapse; margin-bottom: 30px; margin-top: 30px;">
-                        <thead>
-                            <tr>
-                                <th class="table-header" style="background-color: #d6336c; color: #ffffff; padding: 12px 18px; text-align: left; font-weight: 600; font-size: 16px;">Date</th>
-                                <th class="table-header" style="background-color: #d6336c; color: #ffffff; padding: 12px 18px; text-align: left; font-weight: 600; font-size: 16px;">Teams</th>
-                                <th class="table-header" style="background-color: #d6336c; color: #ffffff; padding: 12px 18px; text-align: left; font-weight: 600; font-size: 16px;">Status</th>
-                            </tr>
-                        </thead>
-                        <tbody>
-            """
-
-            for event in new_status_events:
-                email_body += f"""
-                            <tr style="background-color: #f9f9f9; border-bottom: 1px solid #e5e5e5;">
-                                <td class="table-cell" style="padding: 14px 20px; font-size: 16px; color: #333333;">{event['date']}</td>
-                                <td class="table-cell" style="padding: 14px 20px; font-size: 16px; color: #333333;">{' vs '.join(event['teams'])}</td>
-                                <td class="table-cell" style="padding: 14px 20px; font-size: 16px; color: #28a745; font-weight: bold;">{event['status']}</td>
-                            </tr>
-                """
-                print(
-                    f"🎟️ {event['date']} - {' vs '.join(event['teams'])} - Status: {event['status']}")
-
-            email_body += """
-                        </tbody>
-                    </table>
-
-                    <!-- Call to Action -->
-                
-
-                    <!-- Footer -->
-                    <div style="margin-top: 40px; text-align: center; font-size: 14px; color: #888888;">
-                        <p>This is an automated alert from <strong>RCB Tickets Alert</strong>.</p>
-                        <p>&copy; 2025 Royal Challengers Bangalore | All Rights Reserved</p>
-                    </div>
-
-                </div>
-            </body>
-            </html>
-            """
-
-            # Prepare and send the email
-            sender = username
-            targets = get_emails()
-            msg = MIMEText(email_body, 'html')
-            msg['Subject'] = '🚨 TICKETS WAITING FOR YOU!'
-            msg['From'] = "RCB Tickets Alert"
-            msg['To'] = ', '.join(targets)
-
-            try:
-                with smtplib.SMTP(smtp_host, smtp_port) as server:
-                    server.starttls()
-                    server.login(username, password)
-                    server.sendmail(sender, targets, msg.as_string())
-                print("✅ Email sent successfully!")
-            except Exception as email_error:
-                print(f"❌ Failed to send email: {email_error}")
-
-        else:
-            print("✅ No new ticket sales detected.")
-
-        save_current_data(new_events)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Browsers live in the worker processes; the API only queues jobs and serves results
+    try:
+        await run_in_threadpool(db_pool.warm)
     except Exception as e:
-        print(f"❌ An error occurred: {e}")
-
-    finally:
-        driver.quit()
+        print(f"❌ Failed to warm the database pool: {e}")
+    # Logs rather than raises, so a database that is briefly down does not keep the API from serving
+    await run_in_threadpool(check_schema)
+    broadcaster.start(asyncio.get_running_loop())
+    if SCHEDULER_ENABLED:
+        poller.start()
+    yield
+    await run_in_threadpool(poller.stop)
+    await run_in_threadpool(broadcaster.stop)
+    await run_in_threadpool(job_queue.close)
+    await run_in_threadpool(db_pool.close)
+    if 'db_async' in sys.modules:  # Only a process that ran the async pipeline has an asyncpg pool
+        await run_in_threadpool(sys.modules['db_async'].close)
 
 
-app = FastAPI()
+app = FastAPI(lifespan=lifespan)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["*"],
@@ -202,6 +78,184 @@ app.add_middleware(
 
 
 @app.get("/", response_class=JSONResponse)
-async def root(background_tasks: BackgroundTasks):
-    background_tasks.add_task(mail_alert)
-    return {"message": "✅ Mail alert task started!"}
+async def root():
+    state, flight = alert_flight.trigger()
+    messages = {
+        "started": "✅ Mail alert task started!",
+        "joined": "⏳ Mail alert task already running.",
+        "throttled": "⏸️ Mail alert task ran recently, try again later.",
+    }
+    # The run id doubles as the id of the job the run queued
+    return {"message": messages[state], "run": state, "run_id": flight.run_id, "job_id": flight.run_id}
+
+
+@app.get("/jobs/{job_id}", response_class=JSONResponse)
+async def job_status(job_id: str):
+    record = await run_in_threadpool(job_queue.get, job_id)
+    if record is None and job_id == alert_flight.status()["run_id"]:
+        record = {"state": "queued"}  # Triggered a moment ago; the flight has not queued it yet
+    if record is None:
+        raise HTTPException(status_code=404, detail="Job not found.")
+    return job_view(job_id, record)
+
+
+def find_target(target_name):
+    target = next((target for target in TARGETS if target.name == target_name), None)
+    if target is None:
+        raise HTTPException(status_code=404, detail=f"Unknown target '{target_name}'.")
+    return target
+
+
+def cached_events(target_name, held):
+    """Serve a target's events from the read cache; Postgres is only queried after a write."""
+    target = find_target(target_name)
+
+    def load():
+        rows = list_events(target, held=held)
+        if rows is None:
+            raise HTTPException(status_code=503, detail="Events are unavailable, try again later.")
+        return rows
+
+    return read_cache.get(target.name, 'held' if held else 'events', load)
+
+
+def etag_response(request, entry):
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if_none_match = request.headers.get("if-none-match", "")
+    tags = {tag.strip().removeprefix("W/") for tag in if_none_match.split(",")}
+    if entry.etag in tags or "*" in tags:
+        return Response(status_code=304, headers=headers)
+    return Response(entry.body, media_type="application/json", headers=headers)
+
+
+@app.get("/events")
+async def events(request: Request, target: str = DEFAULT_TARGET.name):
+    entry = await run_in_threadpool(cached_events, target, False)
+    return etag_response(request, entry)
+
+
+@app.get("/events/held")
+async def held_events(request: Request, target: str = DEFAULT_TARGET.name):
+    entry = await run_in_threadpool(cached_events, target, True)
+    return etag_response(request, entry)
+
+
+@app.get("/events/history", response_class=JSONResponse)
+async def events_history(target: str = DEFAULT_TARGET.name, event_date: datetime | None = None,
+                         since: datetime | None = None, limit: int = Query(HISTORY_LIMIT, ge=1, le=HISTORY_LIMIT)):
+    """Recent status transitions per event, optionally for one event or since a point in time."""
+    timelines = await run_in_threadpool(load_transitions, find_target(target), event_date, since, limit)
+    if timelines is None:
+        raise HTTPException(status_code=503, detail="Status history is unavailable, try again later.")
+    return timelines
+
+
+def cached_sellout(target):
+    def load():
+        rows = load_time_to_sellout(target)
+        if rows is None:
+            raise HTTPException(status_code=503, detail="Status history is unavailable, try again later.")
+        return rows
+
+    return read_cache.get(target.name, 'sellout', load)
+
+
+@app.get("/events/sellout")
+async def events_sellout(request: Request, target: str = DEFAULT_TARGET.name):
+    """When each event went on sale and sold out, served from the read cache like /events."""
+    entry = await run_in_threadpool(cached_sellout, find_target(target))
+    return etag_response(request, entry)
+
+
+async def sse_stream(request):
+    # Subscribed once the response starts iterating, so a client gone before then leaves nothing behind
+    subscription = broadcaster.subscribe()
+    try:
+        yield "retry: 5000\n\n"
+        while not await request.is_disconnected():
+            message = await subscription.next()
+            dropped = subscription.take_dropped()
+            if dropped:
+                # The client fell behind; it should refetch /events rather than trust the stream
+                yield f"event: lagged\ndata: {{\"dropped\": {dropped}}}\n\n"
+            if message is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield f"event: change\ndata: {message}\n\n"
+    finally:
+        broadcaster.unsubscribe(subscription)
+
+
+@app.get("/events/stream")
+async def events_stream(request: Request):
+    """Server-Sent Events: one `change` event per batch of events the pipeline wrote."""
+    return StreamingResponse(sse_stream(request), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+
+@app.websocket("/ws/events")
+async def events_socket(websocket: WebSocket):
+    """WebSocket feed carrying the same change messages as /events/stream."""
+    await websocket.accept()
+    subscription = broadcaster.subscribe()
+    try:
+        while True:
+            message = await subscription.next()
+            dropped = subscription.take_dropped()
+            if dropped:
+                await websocket.send_text(f'{{"kind": "lagged", "dropped": {dropped}}}')
+            if message is not None:
+                await websocket.send_text(message)
+            else:
+                await websocket.send_text('{"kind": "keep-alive"}')
+    except (WebSocketDisconnect, RuntimeError):
+        pass
+    finally:
+        broadcaster.unsubscribe(subscription)
+
+
+@app.get("/broadcast", response_class=JSONResponse)
+async def broadcast_status():
+    return broadcaster.stats()
+
+
+@app.get("/lease", response_class=JSONResponse)
+async def lease_status():
+    return await run_in_threadpool(alert_lease.stats)
+
+
+@app.get("/scheduler", response_class=JSONResponse)
+async def scheduler_status():
+    return poller.status()
+
+
+@app.post("/scheduler/start", response_class=JSONResponse)
+async def scheduler_start():
+    started = poller.start()
+    return dict(poller.status(), message="✅ Scheduler started." if started else "Scheduler already running.")
+
+
+@app.post("/scheduler/stop", response_class=JSONResponse)
+async def scheduler_stop():
+    stopped = await run_in_threadpool(poller.stop)
+    return dict(poller.status(), message="🛑 Scheduler stopped." if stopped else "Scheduler is not running.")
+
+
+def metric_gauges():
+    """Point-in-time pool and lease figures to export next to the run metrics."""
+    gauges = {}
+    for name, value in db_pool.stats().items():
+        gauges[f'rcb_db_pool_{name}'] = (f'Database pool {name.replace("_", " ")}.', value)
+    lease = alert_lease.stats()
+    for name in ("acquired", "contended", "expired", "released"):
+        gauges[f'rcb_lease_{name}'] = (f'Alert lease {name} count in this process.', lease[name])
+    gauges['rcb_lease_held'] = ('1 while a worker holds the alert lease.', int(lease["holder"] is not None))
+    return gauges
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+async def metrics_endpoint():
+    if not metrics.METRICS_ENABLED:
+        return PlainTextResponse("# Metrics are disabled (METRICS_ENABLED=false).\n", status_code=404)
+    gauges = await run_in_threadpool(metric_gauges)
+    return PlainTextResponse(metrics.render(gauges), media_type="text/plain; version=0.0.4")
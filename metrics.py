@@ -0,0 +1,212 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+from dotenv import load_dotenv
+
+# Load environment variables from the .env file
+load_dotenv()
+
+METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
+
+# Upper bounds in seconds, from a cached Redis read to a cold browser page load
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60)
+
+
+def _labels_text(names, values):
+    if not names:
+        return ''
+    pairs = ','.join(
+        f'{name}="' + str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') + '"'
+        for name, value in zip(names, values))
+    return '{' + pairs + '}'
+
+
+class Counter:
+    """Monotonic counter, optionally split by labels."""
+
+    type = 'counter'
+
+    def __init__(self, name, help_text, labels=()):
+        self.name = f'{name}_total'
+        self.help = help_text
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, **labels):
+        key = tuple(labels.get(name, '') for name in self.labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def values(self):
+        with self._lock:
+            return dict(self._values)
+
+    def add(self, key, value):
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + value
+
+    def samples(self):
+        with self._lock:
+            values = dict(self._values)
+        for key, value in sorted(values.items()):
+            yield f'{self.name}{_labels_text(self.labels, key)} {value}'
+
+
+class Histogram:
+    """Cumulative-bucket histogram of durations in seconds."""
+
+    type = 'histogram'
+
+    def __init__(self, name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help_text
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}  # label values -> [bucket counts..., count, sum]
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, **labels):
+        key = tuple(labels.get(name, '') for name in self.labels)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [0] * (len(self.buckets) + 2)
+            for i, bound in enumerate(self.buckets):
+                if seconds <= bound:
+                    series[i] += 1
+            series[-2] += 1
+            series[-1] += seconds
+
+    @contextmanager
+    def time(self, **labels):
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - started, **labels)
+
+    def values(self):
+        with self._lock:
+            return {key: list(values) for key, values in self._series.items()}
+
+    def add(self, key, values):
+        with self._lock:
+            series = self._series.setdefault(key, [0] * (len(self.buckets) + 2))
+            for i, value in enumerate(values):
+                series[i] += value
+
+    def samples(self):
+        with self._lock:
+            series = {key: list(values) for key, values in self._series.items()}
+        names = self.labels + ('le',)
+        for key, values in sorted(series.items()):
+            for bound, count in zip(self.buckets, values):
+                yield f'{self.name}_bucket{_labels_text(names, key + (bound,))} {count}'
+            yield f'{self.name}_bucket{_labels_text(names, key + ("+Inf",))} {values[-2]}'
+            yield f'{self.name}_count{_labels_text(self.labels, key)} {values[-2]}'
+            yield f'{self.name}_sum{_labels_text(self.labels, key)} {values[-1]:.6f}'
+
+
+class _NoopMetric:
+    """Stands in for every metric when METRICS_ENABLED is false."""
+
+    def inc(self, amount=1, **labels):
+        pass
+
+    def observe(self, seconds, **labels):
+        pass
+
+    @contextmanager
+    def time(self, **labels):
+        yield
+
+
+_NOOP = _NoopMetric()
+_registry = []
+
+
+def counter(name, help_text, labels=()):
+    if not METRICS_ENABLED:
+        return _NOOP
+    metric = Counter(name, help_text, labels)
+    _registry.append(metric)
+    return metric
+
+
+def histogram(name, help_text, labels=(), buckets=DEFAULT_BUCKETS):
+    if not METRICS_ENABLED:
+        return _NOOP
+    metric = Histogram(name, help_text, labels, buckets)
+    _registry.append(metric)
+    return metric
+
+
+def snapshot():
+    """Current values of every metric, to diff against after a job with changes_since()."""
+    return {metric.name: metric.values() for metric in _registry}
+
+
+def changes_since(before):
+    """What was recorded since snapshot() returned `before`, as JSON-friendly data for merge()."""
+    changes = {}
+    for metric in _registry:
+        previous = before.get(metric.name, {})
+        for key, value in metric.values().items():
+            if isinstance(value, list):
+                old = previous.get(key, [0] * len(value))
+                delta = [now - then for now, then in zip(value, old)]
+                if not delta[-2]:  # No new observations
+                    continue
+            else:
+                delta = value - previous.get(key, 0)
+                if not delta:
+                    continue
+            changes.setdefault(metric.name, []).append([list(key), delta])
+    return changes
+
+
+def merge(changes):
+    """Add metrics recorded in another process (see changes_since) to this process's metrics."""
+    by_name = {metric.name: metric for metric in _registry}
+    for name, series in (changes or {}).items():
+        metric = by_name.get(name)
+        if metric is None:
+            continue
+        for key, delta in series:
+            metric.add(tuple(key), delta)
+
+
+def render(gauges=None):
+    """Return every metric in the Prometheus text exposition format.
+
+    `gauges` maps a metric name to (help text, value) for point-in-time values
+    such as pool and lease state, read when the endpoint is scraped.
+    """
+    lines = []
+    for metric in _registry:
+        lines.append(f'# HELP {metric.name} {metric.help}')
+        lines.append(f'# TYPE {metric.name} {metric.type}')
+        lines.extend(metric.samples())
+    for name, (help_text, value) in (gauges or {}).items():
+        if value is None:
+            continue
+        lines.append(f'# HELP {name} {help_text}')
+        lines.append(f'# TYPE {name} gauge')
+        lines.append(f'{name} {float(value)}')
+    return '\n'.join(lines) + '\n'
+
+
+STAGE_SECONDS = histogram('rcb_stage_seconds', 'Time spent in each alert pipeline stage.', ['stage'])
+DRIVER_ACQUIRE_SECONDS = histogram('rcb_driver_acquire_seconds', 'Time waiting for a pooled browser driver.')
+PAGE_LOAD_SECONDS = histogram('rcb_page_load_seconds', 'Time until the ticket page rendered its first event.')
+DB_CALL_SECONDS = histogram('rcb_db_call_seconds', 'Duration of each database call.', ['call'])
+SMTP_SEND_SECONDS = histogram('rcb_smtp_send_seconds', 'Duration of each SMTP send.', ['outcome'])
+RUNS = counter('rcb_runs', 'Alert runs by outcome.', ['outcome'])
+EVENTS_SEEN = counter('rcb_events_seen', 'Events scraped from the ticket page.')
+NEW_EVENTS = counter('rcb_new_events', 'Events with newly active tickets.')
+EMAILS_SENT = counter('rcb_emails_sent', 'Alert emails accepted by the SMTP server.')
+EMAIL_RECIPIENTS = counter('rcb_email_recipients', 'Recipients of accepted alert emails.')
+FAILURES = counter('rcb_failures', 'Failed operations by kind.', ['kind'])
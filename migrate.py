@@ -0,0 +1,171 @@
+"""Bring the database schema up to date for every configured target.
+
+Removes duplicate rows (keeping the lowest id) before building the unique
+indexes the upserts rely on, and adds the subscriber preference columns and
+their indexes. Safe to run again; concurrent runs wait on an advisory lock.
+
+On startup only the non-destructive steps run, and only when something is
+missing; duplicates are removed by running this script.
+
+Usage: python migrate.py
+"""
+import os
+
+from dotenv import load_dotenv
+from psycopg2 import sql
+
+from db_connection import get_connection
+
+# Load environment variables from the .env file
+load_dotenv()
+
+# false to only warn on startup about a missing table or index instead of creating it
+MIGRATE_ON_STARTUP = os.getenv('MIGRATE_ON_STARTUP', 'true').lower() == 'true'
+
+MIGRATION_LOCK = 0x7263626d  # Advisory lock id shared by every process that migrates
+
+TARGET_TABLES = """
+    CREATE TABLE IF NOT EXISTS {events} (
+        id serial PRIMARY KEY, event_date timestamp, teams text[], status text);
+    CREATE TABLE IF NOT EXISTS {held} (
+        id serial PRIMARY KEY, event_date timestamp, teams text[], status text);
+"""
+
+# Rows written before the unique indexes existed; keep the first copy of each
+DEDUPE = """
+    DELETE FROM {events} AS later USING {events} AS earlier
+        WHERE later.event_date = earlier.event_date AND later.id > earlier.id;
+    DELETE FROM {held} AS later USING {held} AS earlier
+        WHERE later.event_date = earlier.event_date AND later.teams = earlier.teams
+          AND later.status = earlier.status AND later.id > earlier.id;
+"""
+
+TARGET_SCHEMA = """
+    CREATE UNIQUE INDEX IF NOT EXISTS {events_key} ON {events} (event_date);
+    CREATE UNIQUE INDEX IF NOT EXISTS {held_key} ON {held} (event_date, teams, status);
+    -- Append-only: one row per status an event was first seen with or changed to
+    CREATE TABLE IF NOT EXISTS {history} (
+        id bigserial PRIMARY KEY, event_date timestamp NOT NULL, teams text[], status text NOT NULL,
+        observed_at timestamptz NOT NULL DEFAULT now());
+    -- Rows arrive in observed_at order, so a BRIN index stays tiny and still prunes time ranges
+    CREATE INDEX IF NOT EXISTS {history_time} ON {history} USING BRIN (observed_at);
+    -- Per-event timelines are index-only scans
+    CREATE INDEX IF NOT EXISTS {history_event} ON {history} (event_date, observed_at) INCLUDE (status, teams);
+    -- First on-sale and sold-out times per event, kept by the statement that appends to the history
+    CREATE TABLE IF NOT EXISTS {summary} (
+        event_date timestamp PRIMARY KEY, on_sale_at timestamptz, sold_out_at timestamptz);
+    INSERT INTO {summary} (event_date, on_sale_at, sold_out_at)
+    SELECT event_date,
+           min(observed_at) FILTER (WHERE status NOT IN ('COMING SOON', 'SOLD OUT')),
+           min(observed_at) FILTER (WHERE status = 'SOLD OUT')
+    FROM {history}
+    WHERE NOT EXISTS (SELECT 1 FROM {summary})  -- Backfill once, from history written before the summary
+    GROUP BY event_date;
+"""
+
+SUBSCRIBER_SCHEMA = """
+    -- Subscriber preferences: NULL means every team / every status
+    ALTER TABLE email ADD COLUMN IF NOT EXISTS teams text[];
+    ALTER TABLE email ADD COLUMN IF NOT EXISTS statuses text[];
+    CREATE INDEX IF NOT EXISTS email_teams_idx ON email USING GIN (teams);
+    CREATE INDEX IF NOT EXISTS email_statuses_idx ON email USING GIN (statuses);
+    CREATE INDEX IF NOT EXISTS email_any_team_idx ON email ((teams IS NULL));
+    CREATE INDEX IF NOT EXISTS email_any_status_idx ON email ((statuses IS NULL));
+    -- Recipients are streamed in email order, so a lookup cut short resumes after the last one queued
+    CREATE INDEX IF NOT EXISTS email_email_idx ON email (email);
+"""
+
+
+# Indexes of the email table that SUBSCRIBER_SCHEMA creates; they also stand for its columns
+SUBSCRIBER_INDEXES = ['email_teams_idx', 'email_statuses_idx', 'email_any_team_idx', 'email_any_status_idx',
+                      'email_email_idx']
+
+
+def schema_names(target):
+    """Names of the tables and indexes TARGET_TABLES and TARGET_SCHEMA create for a target."""
+    events, held, history = target.events_table, target.held_table, target.history_table
+    return {
+        "events": events, "held": held, "history": history, "summary": target.summary_table,
+        "events_key": f'{events}_event_date_key', "held_key": f'{held}_signature_key',
+        "history_time": f'{history}_observed_at_brin', "history_event": f'{history}_event_idx',
+    }
+
+
+def target_schema(target, template=TARGET_SCHEMA):
+    names = {key: sql.Identifier(name) for key, name in schema_names(target).items()}
+    return sql.SQL(template).format(**names)
+
+
+def default_targets(targets):
+    if targets is None:
+        from targets import TARGETS
+        targets = TARGETS
+    return targets
+
+
+def migrate(targets=None, dedupe=False):
+    """Apply the schema in one transaction; raises if any step fails, leaving the database as it was.
+
+    Only `dedupe` deletes rows. Without it, building a unique index over
+    duplicated rows fails and nothing is changed.
+    """
+    targets = default_targets(targets)
+
+    with get_connection() as connection, connection.cursor() as cursor:
+        cursor.execute("SELECT pg_advisory_xact_lock(%s)", (MIGRATION_LOCK,))
+        for target in targets:
+            cursor.execute(target_schema(target, TARGET_TABLES))
+            if dedupe:
+                cursor.execute(target_schema(target, DEDUPE))
+            cursor.execute(target_schema(target))
+        cursor.execute(SUBSCRIBER_SCHEMA)
+        connection.commit()
+    print(f"🗄️ Schema ready for {', '.join(target.name for target in targets)}.")
+
+
+def missing_schema(targets=None):
+    """Names of the tables and indexes the schema needs that do not exist yet; only reads the catalog."""
+    names = [name for target in default_targets(targets) for name in schema_names(target).values()]
+    names += SUBSCRIBER_INDEXES
+    with get_connection() as connection, connection.cursor() as cursor:
+        cursor.execute("SELECT name FROM unnest(%s::text[]) AS name WHERE to_regclass(quote_ident(name)) IS NULL",
+                       (names,))
+        return [name for name, in cursor.fetchall()]
+
+
+def check_schema(targets=None):
+    """Startup check: create what is missing without deleting rows, and log instead of raising.
+
+    An up-to-date schema costs one catalog read and takes no locks. If the
+    database is unreachable or a step fails, the process still starts; reads
+    answer 503 and runs report their failed writes until it is fixed.
+    """
+    try:
+        missing = missing_schema(targets)
+        if not missing:
+            return True
+        if not MIGRATE_ON_STARTUP:
+            print(f"⚠️ Missing from the database: {', '.join(missing)}. Run `python migrate.py`.")
+            return False
+        migrate(targets)
+        return True
+    except Exception as e:
+        print(f"❌ Schema check failed, run `python migrate.py`: {e}")
+        return False
+
+
+def main():
+    from db_connection import pool as db_pool
+
+    try:
+        migrate(dedupe=True)
+    except Exception as e:
+        print(f"❌ Migration failed: {e}")
+        return 1
+    finally:
+        db_pool.close()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())
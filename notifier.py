@@ -0,0 +1,475 @@
+import json
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from dotenv import load_dotenv
+
+from events import Event
+from metrics import EMAIL_RECIPIENTS, EMAILS_SENT, FAILURES, SMTP_SEND_SECONDS
+
+# Load environment variables from the .env file
+load_dotenv()
+
+smtp_host = os.getenv('EMAIL_HOST')
+smtp_port = int(os.getenv('EMAIL_PORT', 587))
+username = os.getenv('EMAIL_USER')
+password = os.getenv('EMAIL_PASS')
+use_tls = os.getenv('EMAIL_USE_TLS', 'true').lower() == 'true'
+
+OUTBOX_PATH = os.getenv('OUTBOX_PATH', 'outbox.sqlite3')
+EMAIL_BATCH_SIZE = int(os.getenv('EMAIL_BATCH_SIZE', 50))  # Recipients per message
+EMAIL_CONCURRENCY = int(os.getenv('EMAIL_CONCURRENCY', 2))  # Parallel SMTP sessions
+EMAIL_MAX_ATTEMPTS = int(os.getenv('EMAIL_MAX_ATTEMPTS', 5))
+EMAIL_RETRY_BASE = float(os.getenv('EMAIL_RETRY_BASE', 30))  # Seconds before the first retry, doubled each time
+EMAIL_SENDING_TIMEOUT = float(os.getenv('EMAIL_SENDING_TIMEOUT', 300))  # Reclaim batches stuck in 'sending'
+
+ALERT_SUBJECT = '🚨 TICKETS WAITING FOR YOU!'
+ALERT_LINK = 'https://shop.royalchallengers.com/ticket'
+
+
+def render_alert_email(events, link=None):
+    """Build the responsive HTML email body listing the given events, linking to `link`."""
+    email_body = """
+            <html>
+            <head>
+                <meta name="viewport" content="width=device-width, initial-scale=1.0">
+                <style>
+                    @media only screen and (max-width: 600px) {
+                        .container {
+                            padding: 20px !important;
+                        }
+                        .table-header, .table-cell {
+                            display: block;
+                            width: 100% !important;
+                            text-align: left !important;
+                        }
+                        .cta-button {
+                            padding: 12px 20px !important;
+                            font-size: 16px !important;
+                        }
+                        .header-text {
+                            font-size: 24px !important;
+                        }
+                        .sub-text {
+                            font-size: 16px !important;
+                        }
+                    }
+                </style>
+            </head>
+            <body style="font-family: 'Helvetica Neue', Arial, sans-serif; background-color: #f7f9fc; padding: 50px;">
+                <div class="container" style="background-color: #ffffff; padding: 40px; border-radius: 12px; border: 1px solid #e5e5e5; box-shadow: 0 10px 20px rgba(0, 0, 0, 0.05); max-width: 650px; margin: auto;">
+                    
+                    <!-- Header -->
+                    <div style="text-align: center; margin-bottom: 30px;">
+                        <img src="https://shop.royalchallengers.com/imgs/rcb-logo-new.png" alt="RCB Logo" style="max-width: 150px; height: auto;">
+                        <h2 class="header-text" style="color: #d6336c; font-size: 32px; margin-top: 20px; font-weight: 600;">🚨 New Ticket Alert! 🚨</h2>
+                        <p class="sub-text" style="font-size: 18px; color: #555555; line-height: 1.6; max-width: 500px; margin: auto;">Get ready for the next RCB match! Below are the latest updates on ticket availability for upcoming events.</p>
+                    </div>
+                <div style="text-align: center; margin-top: 30px;">
+                        <a href="{link}" 
+                        class="cta-button" 
+                        style="background-color: #d6336c; color: white; padding: 15px 30px; font-size: 18px; font-weight: 600; border-radius: 8px; text-decoration: none; display: inline-block;">
+                            Grab Your Tickets Now! 🎟️
+                        </a>
+                    </div>
+                    <!-- Table -->
+                    <table style="width: 100%; border-collapse: collapse; margin-bottom: 30px; margin-top: 30px;">
+                        <thead>
+                            <tr>
+                                <th class="table-header" style="background-color: #d6336c; color: #ffffff; padding: 12px 18px; text-align: left; font-weight: 600; font-size: 16px;">Date</th>
+                                <th class="table-header" style="background-color: #d6336c; color: #ffffff; padding: 12px 18px; text-align: left; font-weight: 600; font-size: 16px;">Teams</th>
+                                <th class="table-header" style="background-color: #d6336c; color: #ffffff; padding: 12px 18px; text-align: left; font-weight: 600; font-size: 16px;">Status</th>
+                            </tr>
+                        </thead>
+                        <tbody>
+            """.replace('{link}', link or ALERT_LINK)
+
+    for event in events:
+        email_body += f"""
+                            <tr style="background-color: #f9f9f9; border-bottom: 1px solid #e5e5e5;">
+                                <td class="table-cell" style="padding: 14px 20px; font-size: 16px; color: #333333;">{event.date}</td>
+                                <td class="table-cell" style="padding: 14px 20px; font-size: 16px; color: #333333;">{' vs '.join(event.teams)}</td>
+                                <td class="table-cell" style="padding: 14px 20px; font-size: 16px; color: #28a745; font-weight: bold;">{event.status}</td>
+                            </tr>
+                """
+
+    email_body += """
+                        </tbody>
+                    </table>
+
+                    <!-- Call to Action -->
+                
+
+                    <!-- Footer -->
+                    <div style="margin-top: 40px; text-align: center; font-size: 14px; color: #888888;">
+                        <p>This is an automated alert from <strong>RCB Tickets Alert</strong>.</p>
+                        <p>&copy; 2025 Royal Challengers Bangalore | All Rights Reserved</p>
+                    </div>
+
+                </div>
+            </body>
+            </html>
+            """
+    return email_body
+
+
+class Outbox:
+    """Durable SQLite queue of alert batches, each sent and retried on its own.
+
+    Subscriber lookups are recorded here too: a lookup remembers the last
+    subscriber whose batch was queued, so one cut short resumes from there.
+    """
+
+    def __init__(self, path=OUTBOX_PATH, max_attempts=EMAIL_MAX_ATTEMPTS, retry_base=EMAIL_RETRY_BASE):
+        self.max_attempts = max_attempts
+        self.retry_base = retry_base
+        self._lock = threading.Lock()
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.executescript("""
+            PRAGMA journal_mode = WAL;
+            CREATE TABLE IF NOT EXISTS outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                subject TEXT NOT NULL,
+                body TEXT NOT NULL,
+                recipients TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                claimed_at REAL,
+                last_error TEXT,
+                created_at REAL NOT NULL,
+                sent_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS outbox_due ON outbox (status, next_attempt_at);
+            CREATE TABLE IF NOT EXISTS lookups (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                events TEXT NOT NULL,
+                link TEXT,
+                after TEXT,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                last_error TEXT,
+                created_at REAL NOT NULL,
+                finished_at REAL
+            );
+        """)
+
+    def enqueue(self, subject, body, recipients, batch_size=EMAIL_BATCH_SIZE):
+        """Split recipients into batches and store one pending message per batch."""
+        return self.enqueue_many([(subject, body, recipients)], batch_size)
+
+    def enqueue_many(self, messages, batch_size=EMAIL_BATCH_SIZE, lookup=None, after=None):
+        """Store (subject, body, recipients) messages in batches, moving `lookup` past `after` in the same commit."""
+        now = time.time()
+        rows = [(subject, body, json.dumps(recipients[i:i + batch_size]), now, now)
+                for subject, body, recipients in messages for i in range(0, len(recipients), batch_size)]
+        with self._lock:
+            self._db.execute("BEGIN")
+            self._db.executemany(
+                "INSERT INTO outbox (subject, body, recipients, next_attempt_at, created_at) VALUES (?, ?, ?, ?, ?)",
+                rows)
+            if lookup is not None:
+                self._db.execute("UPDATE lookups SET after = ? WHERE id = ?", (after, lookup))
+            self._db.execute("COMMIT")
+        return len(rows)
+
+    def begin_lookup(self, events, link=None):
+        """Record a subscriber lookup for `events` before it starts; returns its id."""
+        with self._lock:
+            return self._db.execute("INSERT INTO lookups (events, link, created_at) VALUES (?, ?, ?)",
+                                    (json.dumps([event.as_dict() for event in events]), link, time.time())).lastrowid
+
+    def finish_lookup(self, lookup, error=None):
+        """Mark a lookup done, or count a failed attempt; it is given up after max_attempts."""
+        with self._lock:
+            if error is None:
+                self._db.execute("UPDATE lookups SET status = 'done', finished_at = ? WHERE id = ?",
+                                 (time.time(), lookup))
+                return 'done'
+            attempts = self._db.execute("SELECT attempts FROM lookups WHERE id = ?", (lookup,)).fetchone()[0] + 1
+            status = 'failed' if attempts >= self.max_attempts else 'pending'
+            self._db.execute("UPDATE lookups SET status = ?, attempts = ?, last_error = ? WHERE id = ?",
+                             (status, attempts, str(error), lookup))
+            return status
+
+    def pending_lookups(self):
+        """Lookups an earlier run could not finish, as (id, events, link, after)."""
+        with self._lock:
+            rows = self._db.execute(
+                "SELECT id, events, link, after FROM lookups WHERE status = 'pending' ORDER BY id").fetchall()
+        return [(id_, [Event(event["date"], event["teams"], event["status"]) for event in json.loads(events)],
+                 link, after) for id_, events, link, after in rows]
+
+    def claim_due(self, limit=100):
+        """Mark due batches as 'sending' and return them as (id, subject, body, recipients)."""
+        now = time.time()
+        with self._lock:
+            self._db.execute("BEGIN IMMEDIATE")
+            rows = self._db.execute("""
+                SELECT id, subject, body, recipients FROM outbox
+                WHERE (status = 'pending' AND next_attempt_at <= ?)
+                   OR (status = 'sending' AND claimed_at <= ?)
+                ORDER BY id LIMIT ?
+            """, (now, now - EMAIL_SENDING_TIMEOUT, limit)).fetchall()
+            self._db.executemany("UPDATE outbox SET status = 'sending', claimed_at = ? WHERE id = ?",
+                                 [(now, row[0]) for row in rows])
+            self._db.execute("COMMIT")
+        return [(id_, subject, body, json.loads(recipients)) for id_, subject, body, recipients in rows]
+
+    def mark_sent(self, batch_id):
+        with self._lock:
+            self._db.execute("UPDATE outbox SET status = 'sent', sent_at = ?, attempts = attempts + 1 WHERE id = ?",
+                             (time.time(), batch_id))
+
+    def mark_failed(self, batch_id, error):
+        """Schedule a retry with exponential backoff, or give up after max_attempts."""
+        with self._lock:
+            attempts = self._db.execute("SELECT attempts FROM outbox WHERE id = ?", (batch_id,)).fetchone()[0] + 1
+            delay = self.retry_base * 2 ** (attempts - 1) * random.uniform(0.8, 1.2)
+            status = 'failed' if attempts >= self.max_attempts else 'pending'
+            self._db.execute("""
+                UPDATE outbox SET status = ?, attempts = ?, next_attempt_at = ?, last_error = ? WHERE id = ?
+            """, (status, attempts, time.time() + delay, str(error), batch_id))
+        return status
+
+    def counts(self):
+        with self._lock:
+            return dict(self._db.execute("SELECT status, COUNT(*) FROM outbox GROUP BY status").fetchall())
+
+
+class SmtpSessionPool:
+    """Authenticated SMTP sessions kept open between sends."""
+
+    def __init__(self, size=EMAIL_CONCURRENCY):
+        self._idle = queue.LifoQueue(maxsize=size)
+
+    def send(self, sender, recipients, message):
+        import smtplib
+
+        server = self._checkout()
+        try:
+            server.sendmail(sender, recipients, message)
+        except smtplib.SMTPServerDisconnected:
+            # The server closed an idle session; log in again once and retry
+            self._close(server)
+            server = self._connect()
+            try:
+                server.sendmail(sender, recipients, message)
+            except Exception:
+                self._close(server)
+                raise
+        except Exception:
+            self._close(server)
+            raise
+        try:
+            self._idle.put_nowait(server)
+        except queue.Full:
+            self._close(server)
+
+    def close(self):
+        while True:
+            try:
+                self._close(self._idle.get_nowait())
+            except queue.Empty:
+                return
+
+    def _checkout(self):
+        try:
+            return self._idle.get_nowait()
+        except queue.Empty:
+            return self._connect()
+
+    @staticmethod
+    def _connect():
+        import smtplib
+
+        server = smtplib.SMTP(smtp_host, smtp_port, timeout=30)
+        try:
+            if use_tls:
+                server.starttls()
+            if username:
+                server.login(username, password)
+        except Exception:
+            SmtpSessionPool._close(server)
+            raise
+        return server
+
+    @staticmethod
+    def _close(server):
+        try:
+            server.quit()
+        except Exception:
+            pass
+
+
+class Dispatcher:
+    """Send due outbox batches through a bounded number of SMTP sessions."""
+
+    def __init__(self, outbox, sessions, concurrency=EMAIL_CONCURRENCY):
+        self.outbox = outbox
+        self.sessions = sessions
+        self.concurrency = concurrency
+
+    def dispatch(self, claim_limit=100):
+        """Send everything that is due and return throughput and latency figures.
+
+        Batches are claimed claim_limit at a time until none are due, so one
+        call delivers an alert to every recipient. Failed batches are due again
+        only after their backoff, which ends the loop.
+        """
+        started = time.perf_counter()
+        stats = {"batches": 0, "sent": 0, "recipients": 0, "retrying": 0, "failed": 0}
+        latencies = []
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as pool:
+            while True:
+                batches = self.outbox.claim_due(claim_limit)
+                if not batches:
+                    break
+                stats["batches"] += len(batches)
+                for batch, (error, latency) in zip(batches, pool.map(self._send, batches)):
+                    latencies.append(latency)
+                    if error is None:
+                        stats["sent"] += 1
+                        stats["recipients"] += len(batch[3])
+                    elif self.outbox.mark_failed(batch[0], error) == 'failed':
+                        stats["failed"] += 1
+                    else:
+                        stats["retrying"] += 1
+
+        if not latencies:
+            return stats
+
+        elapsed = time.perf_counter() - started
+        latencies.sort()
+        stats.update(
+            elapsed_s=round(elapsed, 3),
+            recipients_per_s=round(stats["recipients"] / elapsed, 1) if elapsed else None,
+            latency_p50_ms=round(latencies[len(latencies) // 2] * 1000, 1),
+            latency_max_ms=round(latencies[-1] * 1000, 1),
+        )
+        if stats["sent"]:
+            print(f"✅ Email sent successfully to {stats['recipients']} recipients in {stats['sent']} batches!")
+        if stats["retrying"] or stats["failed"]:
+            print(f"❌ Failed to send {stats['retrying'] + stats['failed']} email batches "
+                  f"({stats['retrying']} will be retried).")
+        return stats
+
+    def _send(self, batch):
+        batch_id, subject, body, recipients = batch
+        from email.mime.text import MIMEText
+
+        msg = MIMEText(body, 'html')
+        msg['Subject'] = subject
+        msg['From'] = "RCB Tickets Alert"
+        # Recipients only go in the envelope, so nobody sees the rest of the batch
+        msg['To'] = "undisclosed-recipients:;"
+
+        started = time.perf_counter()
+        try:
+            self.sessions.send(username, recipients, msg.as_string())
+        except Exception as e:
+            latency = time.perf_counter() - started
+            SMTP_SEND_SECONDS.observe(latency, outcome='error')
+            FAILURES.inc(kind='smtp_send')
+            return e, latency
+        latency = time.perf_counter() - started
+        SMTP_SEND_SECONDS.observe(latency, outcome='sent')
+        EMAILS_SENT.inc()
+        EMAIL_RECIPIENTS.inc(len(recipients))
+        self.outbox.mark_sent(batch_id)
+        return None, latency
+
+
+_dispatcher = None
+
+
+def get_dispatcher():
+    """Return the process-wide dispatcher, opening the outbox on first use."""
+    global _dispatcher
+    if _dispatcher is None:
+        _dispatcher = Dispatcher(Outbox(), SmtpSessionPool())
+    return _dispatcher
+
+
+def queue_alert(events, recipients, link=None):
+    """Store an alert for the given events in the outbox; returns the number of batches."""
+    if not recipients:
+        print("⚠️ No subscribers to alert.")
+        return 0
+    return get_dispatcher().outbox.enqueue(ALERT_SUBJECT, render_alert_email(events, link), list(recipients))
+
+
+def queue_matched_alerts(events, recipient_chunks, link=None, lookup=None):
+    """Queue one alert per distinct set of matching events.
+
+    `recipient_chunks` yields lists of (email, event indexes), as produced by
+    demo.iter_alert_recipients; each subscriber only hears about their events.
+    The lookup is recorded in the outbox first (or `lookup` continues an
+    earlier one), so if the chunks stop with an error it stays pending for
+    alerts.resume_lookups and the error is raised. Returns the number of
+    recipients queued.
+    """
+    if lookup is None:
+        lookup = begin_lookup(events, link)
+    bodies = {}
+    try:
+        queued = sum(queue_matched_chunk(events, chunk, bodies, link, lookup) for chunk in recipient_chunks)
+    except Exception as e:
+        finish_lookup(lookup, e)
+        raise
+    finish_lookup(lookup)
+    if not queued:
+        print("⚠️ No subscribers to alert.")
+    return queued
+
+
+def queue_matched_chunk(events, chunk, bodies, link=None, lookup=None):
+    """Queue one chunk of (email, event indexes) pairs, reusing the bodies rendered so far.
+
+    Chunks arrive in email order; `lookup` moves past the chunk's last
+    subscriber in the same commit as its batches.
+    """
+    if not chunk:
+        return 0
+    groups = {}
+    for email, indexes in chunk:
+        groups.setdefault(indexes, []).append(email)
+    messages = []
+    for indexes, emails in groups.items():
+        if indexes not in bodies:
+            bodies[indexes] = render_alert_email([events[i] for i in indexes], link)
+        messages.append((ALERT_SUBJECT, bodies[indexes], emails))
+    get_dispatcher().outbox.enqueue_many(messages, lookup=lookup, after=chunk[-1][0])
+    return len(chunk)
+
+
+def begin_lookup(events, link=None):
+    return get_dispatcher().outbox.begin_lookup(events, link)
+
+
+def finish_lookup(lookup, error=None):
+    status = get_dispatcher().outbox.finish_lookup(lookup, error)
+    if status == 'failed':
+        FAILURES.inc(kind='lookup')
+        print(f"❌ Gave up looking up subscribers for alert {lookup}: {error}")
+    return status
+
+
+def pending_lookups():
+    return get_dispatcher().outbox.pending_lookups()
+
+
+def flush_outbox():
+    """Send whatever is due, including earlier batches waiting for a retry."""
+    return get_dispatcher().dispatch()
+
+
+def close_notifier():
+    if _dispatcher is not None:
+        _dispatcher.sessions.close()
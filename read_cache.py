@@ -0,0 +1,107 @@
+import hashlib
+import os
+import threading
+import time
+
+import orjson
+from dotenv import load_dotenv
+from redis.exceptions import RedisError
+
+from redis_client import get_redis
+
+# Load environment variables from the .env file
+load_dotenv()
+
+READ_CACHE_TTL = float(os.getenv('READ_CACHE_TTL', 300))  # Seconds before a cached response is rebuilt anyway
+
+
+class CachedResponse:
+    """A serialized response body and its ETag."""
+
+    def __init__(self, body, generation):
+        self.body = body
+        self.etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        self.generation = generation
+        self.built_at = time.monotonic()
+
+
+class ReadCache:
+    """Serialized read API responses, rebuilt from Postgres only after the data changed.
+
+    Every (target, kind) pair has a generation number that writers bump. With
+    REDIS_URL set the generation lives in Redis, so a write in any worker
+    process invalidates the copy cached by every API process.
+    """
+
+    def __init__(self, client=None, ttl=READ_CACHE_TTL):
+        self.client = client
+        self.ttl = ttl
+        self._entries = {}
+        self._generations = {}
+        self._lock = threading.Lock()
+        self._build_lock = threading.Lock()
+
+    def get(self, target_name, kind, loader):
+        """Return the CachedResponse for `kind` of a target, calling loader() on a miss."""
+        key = (target_name, kind)
+        generation = self._generation(key)
+        entry = self._fresh(key, generation)
+        if entry is not None:
+            return entry
+
+        # One rebuild at a time; requests that waited find the new entry instead of querying again
+        with self._build_lock:
+            entry = self._fresh(key, generation)
+            if entry is None:
+                entry = CachedResponse(orjson.dumps(loader()), generation)
+                with self._lock:
+                    self._entries[key] = entry
+        return entry
+
+    def invalidate(self, target_name, kind):
+        key = (target_name, kind)
+        with self._lock:
+            self._generations[key] = self._generations.get(key, 0) + 1
+            self._entries.pop(key, None)
+        if self.client is not None:
+            try:
+                self.client.incr(self._redis_key(key))
+            except RedisError as e:
+                print(f"⚠️ Read cache generation not shared: {e}")
+
+    def invalidate_result(self, result):
+        """Invalidate what a finished alert job wrote.
+
+        Local worker processes bump their own in-process generations, which
+        the API never sees; the job result tells the API which tables changed.
+        """
+        for name, target_result in ((result or {}).get("targets") or {}).items():
+            if target_result.get("events_changed"):
+                self.invalidate(name, 'events')
+                self.invalidate(name, 'sellout')
+            if target_result.get("new_events"):
+                self.invalidate(name, 'held')
+
+    def _fresh(self, key, generation):
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None or entry.generation != generation or time.monotonic() - entry.built_at > self.ttl:
+            return None
+        return entry
+
+    def _generation(self, key):
+        with self._lock:
+            local = self._generations.get(key, 0)
+        if self.client is None:
+            return local
+        try:
+            return (local, self.client.get(self._redis_key(key)))
+        except RedisError:
+            return (local, None)
+
+    @staticmethod
+    def _redis_key(key):
+        return f'rcb:read:{key[0]}:{key[1]}:generation'
+
+
+read_cache = ReadCache(get_redis())
@@ -0,0 +1,18 @@
+import os
+from dotenv import load_dotenv
+
+# Load environment variables from the .env file
+load_dotenv()
+
+REDIS_URL = os.getenv('REDIS_URL')
+
+_client = None
+
+
+def get_redis():
+    """Return the shared Redis client, or None when REDIS_URL is not configured."""
+    global _client
+    if _client is None and REDIS_URL:
+        import redis
+        _client = redis.Redis.from_url(REDIS_URL, decode_responses=True)
+    return _client
@@ -0,0 +1,105 @@
+import os
+import random
+import threading
+import time
+
+from dotenv import load_dotenv
+
+# Load environment variables from the .env file
+load_dotenv()
+
+SCHEDULER_ENABLED = os.getenv('SCHEDULER_ENABLED', 'false').lower() == 'true'
+POLL_MIN_INTERVAL = float(os.getenv('POLL_MIN_INTERVAL', 15))  # Seconds between polls while the page is changing
+POLL_WATCH_INTERVAL = float(os.getenv('POLL_WATCH_INTERVAL', 60))  # Ceiling while any event is COMING SOON
+POLL_MAX_INTERVAL = float(os.getenv('POLL_MAX_INTERVAL', 600))  # Ceiling when nothing is about to go on sale
+POLL_BACKOFF = float(os.getenv('POLL_BACKOFF', 1.5))  # Interval multiplier after each unchanged poll
+POLL_JITTER = float(os.getenv('POLL_JITTER', 0.2))  # +/- fraction of randomness added to every interval
+
+WATCH_STATUSES = {"COMING SOON"}
+
+
+class AdaptivePoller:
+    """Trigger the alert run on its own, polling faster while ticket statuses move.
+
+    A changed page resets the interval to POLL_MIN_INTERVAL; every unchanged
+    or failed poll multiplies it by POLL_BACKOFF, up to POLL_WATCH_INTERVAL
+    while an event is still COMING SOON and POLL_MAX_INTERVAL otherwise.
+    """
+
+    def __init__(self, flight, min_interval=POLL_MIN_INTERVAL, watch_interval=POLL_WATCH_INTERVAL,
+                 max_interval=POLL_MAX_INTERVAL, backoff=POLL_BACKOFF, jitter=POLL_JITTER):
+        self.flight = flight
+        self.min_interval = min_interval
+        self.watch_interval = watch_interval
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.jitter = jitter
+        self.interval = min_interval
+        self.polls = 0
+        self.last_result = None
+        self.next_poll_at = None
+        self._stop = threading.Event()
+        self._thread = None
+        self._lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self):
+        with self._lock:
+            if self.running:
+                return False
+            self._stop.clear()
+            self.interval = self.min_interval
+            self._thread = threading.Thread(target=self._loop, name='adaptive-poller', daemon=True)
+            self._thread.start()
+            return True
+
+    def stop(self, timeout=5):
+        with self._lock:
+            if not self.running:
+                return False
+            self._stop.set()
+            thread = self._thread
+        # A poll in progress finishes on its own; we only stop waiting for it
+        thread.join(timeout)
+        self.next_poll_at = None
+        return True
+
+    def status(self):
+        return {
+            "running": self.running,
+            "interval": round(self.interval, 2),
+            "next_poll_at": self.next_poll_at,
+            "polls": self.polls,
+            "last_result": self.last_result,
+        }
+
+    def next_interval(self, result):
+        """Pick the delay before the next poll from what the last one saw."""
+        result = result or {}
+        # A failed run saw nothing reliable, so it backs off like an unchanged page instead of polling faster
+        failed = not result or result.get("errors") or any(
+            "error" in target_result for target_result in (result.get("targets") or {}).values())
+        changed = not failed and result.get("digest") is not None and not result.get("short_circuited")
+        if changed:
+            interval = self.min_interval
+        else:
+            watching = any(status in WATCH_STATUSES for status in result.get("statuses", {}))
+            ceiling = self.watch_interval if watching else self.max_interval
+            interval = min(max(self.interval * self.backoff, self.min_interval), ceiling)
+        return interval
+
+    def _loop(self):
+        delay = 0
+        while not self._stop.wait(delay):
+            _, flight = self.flight.trigger()
+            result = flight.wait()
+            self.polls += 1
+            self.last_result = result
+            self.interval = self.next_interval(result)
+
+            # Jitter keeps several instances from polling in lockstep
+            delay = self.interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+            self.next_poll_at = time.time() + delay
@@ -0,0 +1,249 @@
+import base64
+import hashlib
+import json
+import os
+import time
+from datetime import datetime
+from zoneinfo import ZoneInfo
+
+from dotenv import load_dotenv
+
+from driver_pool import BROWSER_EXTRACTION, driver_pool
+from event_parser import parse_events
+from events import PAGE_DATE_FORMAT, Event
+from metrics import FAILURES, PAGE_LOAD_SECONDS
+from stages import stage
+from targets import DEFAULT_TARGET, host_limiter
+
+# Load environment variables from the .env file
+load_dotenv()
+
+SCRAPE_MODE = os.getenv('SCRAPE_MODE', 'auto')  # auto, http or browser
+HTTP_TIMEOUT = float(os.getenv('HTTP_TIMEOUT', 10))
+WAIT_TIMEOUT = float(os.getenv('SCRAPE_WAIT_TIMEOUT', 15))
+
+PAGE_TIMEZONE = ZoneInfo('Asia/Kolkata')  # The ticket page shows match times in IST
+
+
+_http_client = None
+
+
+def get_http_client():
+    """Return the process-wide httpx client, so keep-alive connections are reused."""
+    global _http_client
+    if _http_client is None:
+        import httpx
+
+        _http_client = httpx.Client(
+            timeout=HTTP_TIMEOUT,
+            follow_redirects=True,
+            limits=httpx.Limits(max_connections=10, max_keepalive_connections=5),
+            headers={
+                'User-Agent': 'Mozilla/5.0 (X11; Linux x86_64) AppleWebKit/537.36 '
+                              '(KHTML, like Gecko) Chrome/124.0 Safari/537.36',
+                'Accept-Language': 'en-US,en;q=0.9',
+            },
+        )
+    return _http_client
+
+
+def close_http_client():
+    global _http_client
+    if _http_client is not None:
+        _http_client.close()
+        _http_client = None
+
+
+def events_digest(events):
+    """Stable hash of an event list, independent of the order the page lists them in."""
+    normalized = sorted(
+        json.dumps([event.date, list(event.teams), event.status]) for event in events)
+    return hashlib.sha256('\n'.join(normalized).encode('utf-8')).hexdigest()
+
+
+def _field(item, *names):
+    """Look up a listing field regardless of its casing or underscores."""
+    normalized = {key.replace('_', '').lower(): value for key, value in item.items()}
+    for name in names:
+        value = normalized.get(name)
+        if value not in (None, ''):
+            return value
+    return None
+
+
+def _listing_rows(payload):
+    """Find the list of event objects inside the listing JSON."""
+    if isinstance(payload, list):
+        if payload and all(isinstance(item, dict) for item in payload):
+            return payload
+        return []
+    if isinstance(payload, dict):
+        for value in payload.values():
+            rows = _listing_rows(value)
+            if rows:
+                return rows
+    return []
+
+
+def _page_date(value):
+    """Render a listing date the way the ticket page shows it."""
+    value = str(value).strip()
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except ValueError:
+        return value
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(PAGE_TIMEZONE).replace(tzinfo=None)
+    return parsed.strftime(PAGE_DATE_FORMAT)
+
+
+def events_from_listing(payload):
+    """Build the same events as event_parser.parse_events from the storefront's listing JSON."""
+    events = []
+    for item in _listing_rows(payload):
+        date = _field(item, 'eventdisplaydate', 'displaydate', 'eventdate', 'date', 'startdate')
+        status = _field(item, 'eventbuttontext', 'buttontext', 'status')
+
+        teams = [team for team in (_field(item, 'team1'), _field(item, 'team2')) if team]
+        if not teams:
+            listed = _field(item, 'teams')
+            if isinstance(listed, list):
+                teams = [str(team).strip() for team in listed if team]
+        if not teams:
+            name = _field(item, 'eventname', 'name', 'title')
+            if name:
+                teams = [part.strip() for part in str(name).replace(' VS ', ' vs ').split(' vs ')]
+
+        if date is None and status is None:
+            continue
+
+        events.append(Event(_page_date(date) if date else 'N/A', teams if teams else ["N/A"],
+                            str(status).strip() if status else 'N/A'))
+
+    return events
+
+
+def fetch_events_http(target=DEFAULT_TARGET):
+    """Fetch events without a browser: the listing JSON first, then the page HTML."""
+    import httpx
+
+    client = get_http_client()
+
+    if target.api_url:
+        try:
+            host_limiter.wait(target.api_url)
+            with stage('fetch'):
+                response = client.get(target.api_url)
+                response.raise_for_status()
+            with stage('parse'):
+                events = events_from_listing(response.json())
+            if events:
+                return events, 'http-api'
+        except (httpx.HTTPError, ValueError) as e:
+            FAILURES.inc(kind='listing_request')
+            print(f"⚠️ Ticket listing request failed for {target.name}: {e}")
+
+    try:
+        host_limiter.wait(target.url)
+        with stage('fetch'):
+            response = client.get(target.url)
+            response.raise_for_status()
+    except httpx.HTTPError as e:
+        FAILURES.inc(kind='page_request')
+        print(f"⚠️ Ticket page request failed for {target.name}: {e}")
+        return [], 'http-html'
+    with stage('parse'):
+        return parse_events(response.text, selectors=target.selectors), 'http-html'
+
+
+def _response_json(driver, request_id):
+    """Read a captured response body over the DevTools protocol."""
+    response = driver.execute_cdp_cmd('Network.getResponseBody', {'requestId': request_id})
+    body = response.get('body', '')
+    if response.get('base64Encoded'):
+        body = base64.b64decode(body).decode('utf-8')
+    return json.loads(body)
+
+
+def capture_listing_events(driver, timeout=WAIT_TIMEOUT, pattern=DEFAULT_TARGET.listing_pattern):
+    """Wait for the listing XHR in the performance log and build events from its JSON."""
+    deadline = time.monotonic() + timeout
+    pending = set()
+
+    while time.monotonic() < deadline:
+        for entry in driver.get_log('performance'):
+            message = json.loads(entry['message'])['message']
+            method = message.get('method')
+            params = message.get('params', {})
+
+            if method == 'Network.responseReceived':
+                response = params.get('response', {})
+                if pattern in response.get('url', '') and 'json' in response.get('mimeType', ''):
+                    pending.add(params['requestId'])
+
+            elif method == 'Network.loadingFinished' and params.get('requestId') in pending:
+                pending.discard(params['requestId'])
+                try:
+                    events = events_from_listing(_response_json(driver, params['requestId']))
+                except Exception as e:
+                    print(f"⚠️ Could not read the captured listing response: {e}")
+                    continue
+                if events:
+                    return events
+
+        time.sleep(0.1)
+
+    return []
+
+
+def fetch_events_browser(target=DEFAULT_TARGET):
+    """Render the ticket page in a pooled headless Chrome and extract its events."""
+    # Selenium is only imported by processes that actually drive a browser
+    from selenium.common.exceptions import TimeoutException
+    from selenium.webdriver.common.by import By
+    from selenium.webdriver.support import expected_conditions as EC
+    from selenium.webdriver.support.ui import WebDriverWait
+
+    host_limiter.wait(target.url)
+    with stage('fetch'), driver_pool.driver() as driver:
+        started = time.perf_counter()
+        if BROWSER_EXTRACTION == 'network':
+            driver.get_log('performance')  # Drop entries left over from the previous run
+            # Page.navigate returns once the navigation commits, not when the page finishes loading
+            driver.execute_cdp_cmd('Page.navigate', {'url': target.url})
+            events = capture_listing_events(driver, pattern=target.listing_pattern)
+            if events:
+                PAGE_LOAD_SECONDS.observe(time.perf_counter() - started)
+                return events, 'browser-network'
+            print("ℹ️ No listing response captured, parsing the rendered page instead.")
+        else:
+            driver.get(target.url)
+
+        # Wait for the first event block rather than for the whole shop to render
+        try:
+            WebDriverWait(driver, WAIT_TIMEOUT).until(
+                EC.presence_of_element_located((By.CSS_SELECTOR, target.selectors.block_css)))
+        except TimeoutException:
+            FAILURES.inc(kind='page_load')
+            print("⚠️ No event blocks rendered in time, parsing the page as it is.")
+        PAGE_LOAD_SECONDS.observe(time.perf_counter() - started)
+        page_source = driver.page_source
+
+    with stage('parse'):
+        return parse_events(page_source, selectors=target.selectors), 'browser'
+
+
+def scrape_events(mode=None, target=DEFAULT_TARGET):
+    """Scrape a target's page and return (events, source) for the configured mode."""
+    mode = mode or SCRAPE_MODE
+
+    if mode == 'browser':
+        return fetch_events_browser(target)
+
+    events, source = fetch_events_http(target)
+    if events or mode == 'http':
+        return events, source
+
+    # The storefront is client-rendered, so fall back to a real browser
+    print("ℹ️ HTTP fast path found no events, falling back to the browser.")
+    return fetch_events_browser(target)
@@ -0,0 +1,71 @@
+import os
+import threading
+import time
+import uuid
+
+from dotenv import load_dotenv
+
+# Load environment variables from the .env file
+load_dotenv()
+
+MIN_RUN_INTERVAL = float(os.getenv('MIN_RUN_INTERVAL', 10))  # Seconds between the starts of two runs
+
+
+class Flight:
+    """One run of the coalesced function; every trigger that joins it shares the result."""
+
+    def __init__(self):
+        self.run_id = uuid.uuid4().hex
+        self.started_at = time.time()
+        self.result = None
+        self._done = threading.Event()
+
+    def wait(self, timeout=None):
+        """Block until the run finishes and return its result (None on timeout)."""
+        self._done.wait(timeout)
+        return self.result
+
+
+class SingleFlight:
+    """Run a function at most once at a time, and not more often than min_interval.
+
+    The function is called with the flight's run_id. trigger() returns
+    (state, flight) where state is 'started' for a new run, 'joined' when a
+    run was already in progress and 'throttled' when the previous run
+    started less than min_interval seconds ago.
+    """
+
+    def __init__(self, fn, min_interval=MIN_RUN_INTERVAL):
+        self.fn = fn
+        self.min_interval = min_interval
+        self._lock = threading.Lock()
+        self._current = None
+        self._last = None
+        self._last_started = None
+
+    def trigger(self):
+        with self._lock:
+            if self._current is not None:
+                return 'joined', self._current
+            if self._last_started is not None and time.monotonic() - self._last_started < self.min_interval:
+                return 'throttled', self._last
+            flight = self._current = Flight()
+            self._last_started = time.monotonic()
+
+        # Run on our own thread so the request returns at once and no threadpool slot is held
+        threading.Thread(target=self._run, args=(flight,), daemon=True).start()
+        return 'started', flight
+
+    def status(self):
+        with self._lock:
+            flight = self._current or self._last
+            return {"running": self._current is not None, "run_id": flight.run_id if flight else None}
+
+    def _run(self, flight):
+        try:
+            flight.result = self.fn(flight.run_id)
+        finally:
+            with self._lock:
+                self._current = None
+                self._last = flight
+            flight._done.set()
@@ -0,0 +1,183 @@
+import json
+import os
+import threading
+
+from dotenv import load_dotenv
+from redis.exceptions import RedisError
+
+from redis_client import get_redis
+
+# Load environment variables from the .env file
+load_dotenv()
+
+SNAPSHOT_TTL = int(os.getenv('SNAPSHOT_TTL', 86400))  # Seconds before a snapshot is reloaded from Postgres
+
+
+def event_key(event_date):
+    """Canonical key for an event: its date as an ISO timestamp."""
+    return event_date.isoformat()
+
+
+def held_signature(event_date, teams, status):
+    """Canonical key for an events_held row."""
+    return json.dumps([event_key(event_date), list(teams), status])
+
+
+class MemorySnapshotCache:
+    """In-process snapshot of rcb_events statuses and events_held signatures.
+
+    Getters return None until the cache has been filled, so callers can tell
+    a cold cache from an empty table. The digest is that of the last page
+    whose writes all went through.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._held = None
+        self._digest = None
+
+    def get_snapshot(self):
+        with self._lock:
+            return dict(self._snapshot) if self._snapshot is not None else None
+
+    def put_snapshot(self, statuses):
+        with self._lock:
+            self._snapshot = dict(statuses)
+
+    def update_snapshot(self, statuses):
+        with self._lock:
+            if self._snapshot is not None:
+                self._snapshot.update(statuses)
+
+    def get_held(self):
+        with self._lock:
+            return set(self._held) if self._held is not None else None
+
+    def put_held(self, signatures):
+        with self._lock:
+            self._held = set(signatures)
+
+    def add_held(self, signatures):
+        with self._lock:
+            if self._held is not None:
+                self._held.update(signatures)
+
+    def get_digest(self):
+        with self._lock:
+            return self._digest
+
+    def put_digest(self, digest):
+        with self._lock:
+            self._digest = digest
+
+    def invalidate(self):
+        with self._lock:
+            self._snapshot = None
+            self._held = None
+            self._digest = None
+
+
+class RedisSnapshotCache:
+    """The same snapshot kept in Redis, so every worker shares one warm copy.
+
+    Statuses live in a hash keyed by event date and held signatures in a set;
+    a marker key records that each one has been loaded from Postgres. The
+    digest sits beside them, so a page one worker processed is skipped by all.
+    """
+
+    def __init__(self, client, prefix='rcb', ttl=SNAPSHOT_TTL):
+        self.client = client
+        self.ttl = ttl
+        self.snapshot_key = f'{prefix}:snapshot:events'
+        self.held_key = f'{prefix}:snapshot:held'
+        self.digest_key = f'{prefix}:snapshot:digest'
+        self.ready_suffix = ':ready'
+
+    def get_snapshot(self):
+        try:
+            pipe = self.client.pipeline()
+            pipe.exists(self.snapshot_key + self.ready_suffix)
+            pipe.hgetall(self.snapshot_key)
+            ready, statuses = pipe.execute()
+        except RedisError as e:
+            print(f"⚠️ Snapshot cache unavailable: {e}")
+            return None
+        return statuses if ready else None
+
+    def put_snapshot(self, statuses):
+        self._replace(self.snapshot_key, statuses, lambda pipe, values: pipe.hset(self.snapshot_key, mapping=values))
+
+    def update_snapshot(self, statuses):
+        if not statuses:
+            return
+        try:
+            # Only touch a snapshot that is already loaded; a partial one would look complete
+            if self.client.exists(self.snapshot_key + self.ready_suffix):
+                self.client.hset(self.snapshot_key, mapping=statuses)
+        except RedisError as e:
+            print(f"⚠️ Snapshot cache unavailable: {e}")
+
+    def get_held(self):
+        try:
+            pipe = self.client.pipeline()
+            pipe.exists(self.held_key + self.ready_suffix)
+            pipe.smembers(self.held_key)
+            ready, signatures = pipe.execute()
+        except RedisError as e:
+            print(f"⚠️ Snapshot cache unavailable: {e}")
+            return None
+        return signatures if ready else None
+
+    def put_held(self, signatures):
+        self._replace(self.held_key, signatures, lambda pipe, values: pipe.sadd(self.held_key, *values))
+
+    def add_held(self, signatures):
+        if not signatures:
+            return
+        try:
+            if self.client.exists(self.held_key + self.ready_suffix):
+                self.client.sadd(self.held_key, *signatures)
+        except RedisError as e:
+            print(f"⚠️ Snapshot cache unavailable: {e}")
+
+    def get_digest(self):
+        try:
+            return self.client.get(self.digest_key)
+        except RedisError as e:
+            print(f"⚠️ Snapshot cache unavailable: {e}")
+            return None
+
+    def put_digest(self, digest):
+        try:
+            self.client.set(self.digest_key, digest, ex=self.ttl)
+        except RedisError as e:
+            print(f"⚠️ Snapshot cache unavailable: {e}")
+
+    def invalidate(self):
+        try:
+            self.client.delete(self.snapshot_key, self.snapshot_key + self.ready_suffix,
+                               self.held_key, self.held_key + self.ready_suffix, self.digest_key)
+        except RedisError as e:
+            print(f"⚠️ Snapshot cache unavailable: {e}")
+
+    def _replace(self, key, values, write):
+        try:
+            pipe = self.client.pipeline()  # MULTI/EXEC, so readers never see a half-written key
+            pipe.delete(key)
+            if values:
+                write(pipe, values)
+            pipe.set(key + self.ready_suffix, 1)
+            pipe.expire(key, self.ttl)
+            pipe.expire(key + self.ready_suffix, self.ttl)
+            pipe.execute()
+        except RedisError as e:
+            print(f"⚠️ Snapshot cache unavailable: {e}")
+
+
+def create_snapshot_cache(prefix='rcb'):
+    client = get_redis()
+    return RedisSnapshotCache(client, prefix=prefix) if client is not None else MemorySnapshotCache()
+
+
+snapshot_cache = create_snapshot_cache()
@@ -0,0 +1,43 @@
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from metrics import STAGE_SECONDS
+
+# Timings and counters of the run in progress on this thread, if one is being collected
+_current = ContextVar('run_stats', default=None)
+
+
+@contextmanager
+def collect():
+    """Collect stage timings and counters for everything run inside the block.
+
+    Yields {"timings": {stage: seconds}, "counts": {name: n}}.
+    """
+    stats = {"timings": {}, "counts": {}}
+    token = _current.set(stats)
+    try:
+        yield stats
+    finally:
+        _current.reset(token)
+
+
+@contextmanager
+def stage(name):
+    """Add the time spent in the block to the current run's `name` stage and its histogram."""
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        elapsed = time.perf_counter() - started
+        STAGE_SECONDS.observe(elapsed, stage=name)
+        stats = _current.get()
+        if stats is not None:
+            timings = stats["timings"]
+            timings[name] = timings.get(name, 0) + elapsed
+
+
+def count(name, amount=1):
+    stats = _current.get()
+    if stats is not None:
+        stats["counts"][name] = stats["counts"].get(name, 0) + amount
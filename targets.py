@@ -0,0 +1,134 @@
+import json
+import os
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from dotenv import load_dotenv
+
+from event_parser import EventSelectors
+from snapshot_cache import create_snapshot_cache, snapshot_cache
+
+# Load environment variables from the .env file
+load_dotenv()
+
+TICKET_URL = os.getenv('TICKET_URL', 'https://shop.royalchallengers.com/ticket')
+# JSON listing the storefront renders its ticket page from; leave empty to scrape the HTML only
+TICKET_API_URL = os.getenv('TICKET_API_URL', 'https://rcbmpapi.ticketgenie.in/ticket/eventlist/O')
+# Substring of the listing request URL to pick out of the browser's network traffic
+LISTING_URL_PATTERN = os.getenv('LISTING_URL_PATTERN', 'eventlist')
+
+TARGETS_FILE = os.getenv('TARGETS_FILE')  # JSON or YAML list of extra pages to monitor
+TARGET_CONCURRENCY = int(os.getenv('TARGET_CONCURRENCY', 4))  # Targets scraped at the same time
+HOST_MIN_INTERVAL = float(os.getenv('HOST_MIN_INTERVAL', 1))  # Seconds between two requests to one host
+
+NAME_PATTERN = re.compile(r'^[a-z][a-z0-9_]*$')
+
+
+class Target:
+    """One storefront listing page: where to fetch it, how to read it and where its rows live.
+
+    Each target has its own events and held tables and its own snapshot cache
+    namespace, so targets never see each other's events.
+    """
+
+    def __init__(self, name, url, api_url='', listing_pattern=LISTING_URL_PATTERN, selectors=None,
+                 events_table=None, held_table=None, history_table=None, summary_table=None, cache=None):
+        if not NAME_PATTERN.match(name):
+            raise ValueError(f"Target name '{name}' must be lowercase letters, digits and underscores.")
+        self.name = name
+        self.url = url
+        self.api_url = api_url or ''
+        self.listing_pattern = listing_pattern
+        self.selectors = EventSelectors(**(selectors or {}))
+        self.events_table = events_table or f'{name}_events'
+        self.held_table = held_table or f'{name}_events_held'
+        self.history_table = history_table or f'{name}_status_history'
+        self.summary_table = summary_table or f'{name}_status_summary'
+        self.cache = cache or create_snapshot_cache(prefix=name)
+
+    @property
+    def host(self):
+        return urlsplit(self.url).hostname
+
+    def __repr__(self):
+        return f'Target({self.name!r}, {self.url!r})'
+
+
+# The page the app has always watched, with its original tables and cache keys
+DEFAULT_TARGET = Target('rcb', TICKET_URL, api_url=TICKET_API_URL, events_table='rcb_events',
+                        held_table='events_held', cache=snapshot_cache)
+
+
+def load_targets(path=TARGETS_FILE):
+    """Read the targets file; without one only the default page is monitored.
+
+    The file holds a list of targets (or {"targets": [...]}) with name and url
+    and optionally api_url, listing_pattern, selectors, events_table,
+    held_table, history_table and summary_table. An entry named 'rcb' replaces the default target.
+    """
+    if not path:
+        return [DEFAULT_TARGET]
+
+    with open(path, encoding='utf-8') as f:
+        if path.endswith(('.yaml', '.yml')):
+            import yaml
+            config = yaml.safe_load(f)
+        else:
+            config = json.load(f)
+    entries = config.get('targets', []) if isinstance(config, dict) else config
+
+    targets = {DEFAULT_TARGET.name: DEFAULT_TARGET}
+    for entry in entries:
+        entry = dict(entry)
+        if entry['name'] == DEFAULT_TARGET.name:
+            entry.setdefault('events_table', DEFAULT_TARGET.events_table)
+            entry.setdefault('held_table', DEFAULT_TARGET.held_table)
+            entry.setdefault('cache', snapshot_cache)
+        targets[entry['name']] = Target(**entry)
+    return list(targets.values())
+
+
+class HostRateLimiter:
+    """Space requests to the same host at least min_interval seconds apart."""
+
+    def __init__(self, min_interval=HOST_MIN_INTERVAL):
+        self.min_interval = min_interval
+        self._next_slot = {}
+        self._lock = threading.Lock()
+
+    def wait(self, url):
+        """Block until a request to the host of `url` is allowed; returns the seconds waited."""
+        host = urlsplit(url).hostname
+        with self._lock:
+            now = time.monotonic()
+            slot = max(now, self._next_slot.get(host, 0))
+            self._next_slot[host] = slot + self.min_interval
+        if slot > now:
+            time.sleep(slot - now)
+        return slot - now
+
+
+TARGETS = load_targets()
+host_limiter = HostRateLimiter()
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def run_targets(fn, targets=None):
+    """Call fn(target) for every target, at most TARGET_CONCURRENCY at a time.
+
+    Returns {target name: result}. A single target runs on the calling thread.
+    """
+    global _executor
+    targets = targets or TARGETS
+    if len(targets) == 1:
+        return {targets[0].name: fn(targets[0])}
+
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(max_workers=TARGET_CONCURRENCY, thread_name_prefix='target')
+    futures = {target.name: _executor.submit(fn, target) for target in targets}
+    return {name: future.result() for name, future in futures.items()}
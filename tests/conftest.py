@@ -0,0 +1,22 @@
+import os
+import sys
+
+import pytest
+
+# The modules live at the repository root, next to main.py
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.smtp_sink import SmtpSink  # noqa: E402
+
+
+@pytest.fixture
+def smtp_sink(monkeypatch):
+    """A local SMTP sink the notifier sends to, without TLS or login."""
+    import notifier
+
+    with SmtpSink() as sink:
+        monkeypatch.setattr(notifier, 'smtp_host', sink.host)
+        monkeypatch.setattr(notifier, 'smtp_port', sink.port)
+        monkeypatch.setattr(notifier, 'use_tls', False)
+        monkeypatch.setattr(notifier, 'username', '')
+        yield sink
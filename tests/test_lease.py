@@ -0,0 +1,97 @@
+import time
+
+import fakeredis
+import pytest
+from redis.exceptions import ConnectionError as RedisConnectionError
+
+from lease import LeaseLost, RedisLease
+
+
+@pytest.fixture
+def client():
+    return fakeredis.FakeRedis(decode_responses=True)
+
+
+def test_second_holder_is_turned_away(client):
+    first, second = RedisLease(client, cooldown_ms=0), RedisLease(client, cooldown_ms=0)
+
+    with first.hold() as handle:
+        assert handle is not None
+        with second.hold() as other:
+            assert other is None
+        handle.ensure()
+
+    with second.hold() as handle:
+        assert handle is not None
+        assert handle.token == 3  # The contended attempt used up token 2
+
+    assert first.snapshot() == {"acquired": 1, "contended": 0, "expired": 0, "released": 1}
+    assert second.snapshot()["contended"] == 1
+
+
+def test_tokens_increase_across_holders(client):
+    lease = RedisLease(client, cooldown_ms=0)
+    tokens = []
+    for _ in range(3):
+        with lease.hold() as handle:
+            tokens.append(handle.token)
+
+    assert tokens == sorted(tokens) and len(set(tokens)) == 3
+
+
+def test_release_keeps_the_key_for_the_cooldown(client):
+    lease = RedisLease(client, cooldown_ms=200)
+
+    with lease.hold() as handle:
+        assert handle is not None
+
+    with lease.hold() as handle:
+        assert handle is None
+    assert 0 < client.pttl(lease.key) <= 200
+
+    time.sleep(0.25)
+    with lease.hold() as handle:
+        assert handle is not None
+
+
+def test_renewal_keeps_a_long_run_valid(client):
+    lease = RedisLease(client, ttl_ms=300, cooldown_ms=0)
+
+    with lease.hold() as handle:
+        time.sleep(0.9)  # Three TTLs, renewed every 100 ms
+        handle.ensure()
+        assert client.get(lease.key) == handle.value
+
+    assert lease.snapshot()["expired"] == 0
+
+
+def test_taken_over_lease_makes_ensure_raise(client):
+    lease = RedisLease(client, ttl_ms=300, cooldown_ms=0)
+
+    with lease.hold() as handle:
+        client.set(lease.key, 'someone-else')
+        time.sleep(0.2)
+        with pytest.raises(LeaseLost):
+            handle.ensure()
+
+    assert lease.snapshot()["expired"] == 1
+    assert client.get(lease.key) == 'someone-else'  # Release only deletes our own value
+
+
+def test_unreachable_redis_invalidates_the_lease_after_the_ttl(client, monkeypatch):
+    lease = RedisLease(client, ttl_ms=300, cooldown_ms=0)
+
+    def unreachable(*args, **kwargs):
+        raise RedisConnectionError('down')
+
+    with lease.hold() as handle:
+        monkeypatch.setattr(lease, '_renew', unreachable)
+        time.sleep(0.15)
+        handle.ensure()  # Still inside the TTL
+        time.sleep(0.35)
+        assert not handle.valid
+        with pytest.raises(LeaseLost):
+            handle.ensure()
+        monkeypatch.setattr(lease, '_release', unreachable)
+
+    assert lease.snapshot()["expired"] == 1
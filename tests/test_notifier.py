@@ -0,0 +1,158 @@
+import socket
+import time
+
+import pytest
+
+import notifier
+from events import Event
+
+
+@pytest.fixture
+def outbox(tmp_path):
+    return notifier.Outbox(str(tmp_path / 'outbox.sqlite3'), max_attempts=3, retry_base=60)
+
+
+def dispatcher(outbox, concurrency=2):
+    return notifier.Dispatcher(outbox, notifier.SmtpSessionPool(concurrency), concurrency)
+
+
+def closed_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def test_enqueue_splits_recipients_into_batches(outbox):
+    recipients = [f'fan{i}@example.com' for i in range(120)]
+
+    assert outbox.enqueue('subject', 'body', recipients, batch_size=50) == 3
+
+    batches = outbox.claim_due()
+    assert [len(batch[3]) for batch in batches] == [50, 50, 20]
+    assert [address for batch in batches for address in batch[3]] == recipients
+    assert outbox.counts() == {'sending': 3}
+
+
+def test_dispatch_sends_every_due_batch(outbox, smtp_sink):
+    recipients = [f'fan{i}@example.com' for i in range(10050)]
+    outbox.enqueue('subject', '<p>body</p>', recipients, batch_size=50)
+
+    sender = dispatcher(outbox)
+    stats = sender.dispatch(claim_limit=100)
+    sender.sessions.close()
+
+    assert stats['batches'] == stats['sent'] == 201
+    assert stats['recipients'] == 10050
+    assert smtp_sink.messages == 201
+    assert smtp_sink.recipients == 10050
+    assert outbox.counts() == {'sent': 201}
+
+
+def test_failed_batch_is_retried_after_backoff(outbox, monkeypatch):
+    monkeypatch.setattr(notifier, 'smtp_host', '127.0.0.1')
+    monkeypatch.setattr(notifier, 'smtp_port', closed_port())
+    monkeypatch.setattr(notifier, 'use_tls', False)
+    outbox.enqueue('subject', 'body', ['fan@example.com'])
+
+    stats = dispatcher(outbox).dispatch()
+
+    assert stats['retrying'] == 1 and stats['failed'] == 0
+    attempts, next_attempt_at = outbox._db.execute(
+        "SELECT attempts, next_attempt_at FROM outbox WHERE status = 'pending'").fetchone()
+    assert attempts == 1
+    assert next_attempt_at >= time.time() + 60 * 0.8 - 1
+    assert outbox.claim_due() == []  # Not due again until the backoff has passed
+
+
+def test_backoff_doubles_and_gives_up_after_max_attempts(outbox):
+    outbox.enqueue('subject', 'body', ['fan@example.com'])
+    batch_id = outbox.claim_due()[0][0]
+
+    delays = []
+    for _ in range(outbox.max_attempts - 1):
+        before = time.time()
+        assert outbox.mark_failed(batch_id, 'refused') == 'pending'
+        delays.append(outbox._db.execute(
+            "SELECT next_attempt_at FROM outbox WHERE id = ?", (batch_id,)).fetchone()[0] - before)
+    assert outbox.mark_failed(batch_id, 'refused') == 'failed'
+
+    assert 60 * 0.8 <= delays[0] <= 60 * 1.2 + 1
+    assert 120 * 0.8 <= delays[1] <= 120 * 1.2 + 1
+    assert outbox.counts() == {'failed': 1}
+    assert outbox.claim_due() == []
+
+
+def test_failed_batches_are_dropped_after_max_attempts(tmp_path, monkeypatch):
+    monkeypatch.setattr(notifier, 'smtp_host', '127.0.0.1')
+    monkeypatch.setattr(notifier, 'smtp_port', closed_port())
+    monkeypatch.setattr(notifier, 'use_tls', False)
+    outbox = notifier.Outbox(str(tmp_path / 'outbox.sqlite3'), max_attempts=3, retry_base=0)
+    outbox.enqueue('subject', 'body', ['fan@example.com'])
+
+    # With no backoff the batch is due again at once, so one dispatch uses every attempt
+    stats = dispatcher(outbox).dispatch()
+
+    assert stats['batches'] == 3
+    assert stats['retrying'] == 2 and stats['failed'] == 1
+    assert outbox.counts() == {'failed': 1}
+
+
+def test_stuck_sending_batch_is_reclaimed(outbox, smtp_sink):
+    outbox.enqueue('subject', 'body', ['fan@example.com'])
+    batch_id = outbox.claim_due()[0][0]  # Claimed by a process that then died
+
+    assert outbox.claim_due() == []
+    outbox._db.execute("UPDATE outbox SET claimed_at = ? WHERE id = ?",
+                       (time.time() - notifier.EMAIL_SENDING_TIMEOUT - 1, batch_id))
+
+    stats = dispatcher(outbox).dispatch()
+
+    assert stats['sent'] == 1
+    assert smtp_sink.messages == 1
+    assert outbox.counts() == {'sent': 1}
+
+
+def test_failed_lookup_stays_pending_and_resumes_after_the_last_queued(outbox, monkeypatch):
+    monkeypatch.setattr(notifier, 'get_dispatcher', lambda: notifier.Dispatcher(outbox, None))
+    events = [Event('2025-05-03T19:30:00+05:30', ['RCB', 'CSK'], 'BUY TICKETS')]
+
+    def chunks():
+        yield [('a@example.com', (0,)), ('b@example.com', (0,))]
+        raise ConnectionError('database went away')
+
+    with pytest.raises(ConnectionError):
+        notifier.queue_matched_alerts(events, chunks())
+
+    [(lookup, pending_events, _, after)] = notifier.pending_lookups()
+    assert pending_events == events and after == 'b@example.com'
+    assert outbox.counts() == {'pending': 1}
+
+    assert notifier.queue_matched_alerts(events, iter([[('c@example.com', (0,))]]), lookup=lookup) == 1
+    assert notifier.pending_lookups() == []
+    assert [address for batch in outbox.claim_due() for address in batch[3]] == [
+        'a@example.com', 'b@example.com', 'c@example.com']
+
+
+def test_failed_retry_after_disconnect_closes_the_new_session(monkeypatch):
+    import smtplib
+
+    class Session:
+        def __init__(self, error):
+            self.error, self.closed = error, False
+
+        def sendmail(self, *args):
+            raise self.error
+
+        def quit(self):
+            self.closed = True
+
+    stale, fresh = Session(smtplib.SMTPServerDisconnected()), Session(smtplib.SMTPDataError(451, 'busy'))
+    sessions = notifier.SmtpSessionPool(1)
+    sessions._idle.put(stale)
+    monkeypatch.setattr(notifier.SmtpSessionPool, '_connect', staticmethod(lambda: fresh))
+
+    with pytest.raises(smtplib.SMTPDataError):
+        sessions.send('from@example.com', ['fan@example.com'], 'message')
+
+    assert stale.closed and fresh.closed
+    assert sessions._idle.empty()
@@ -0,0 +1,36 @@
+from scheduler import AdaptivePoller
+
+
+def poller():
+    poller = AdaptivePoller(flight=None, min_interval=15, watch_interval=60, max_interval=600, backoff=2)
+    poller.interval = 40
+    return poller
+
+
+def test_changed_page_polls_at_the_fastest_rate():
+    result = {"digest": "abc", "short_circuited": False, "targets": {"rcb": {}}}
+
+    assert poller().next_interval(result) == 15
+
+
+def test_unchanged_page_backs_off():
+    result = {"digest": "abc", "short_circuited": True, "statuses": {"SOLD OUT": 3}}
+
+    assert poller().next_interval(result) == 80
+
+
+def test_failed_runs_back_off_like_an_unchanged_page():
+    errored = {"digest": "abc", "short_circuited": False, "errors": {"rcb": "boom"},
+               "targets": {"rcb": {"error": "boom"}}}
+    write_failed = {"digest": "abc", "short_circuited": False,
+                    "targets": {"rcb": {"error": "Could not save the events to the database."}}}
+
+    assert poller().next_interval(errored) == 80
+    assert poller().next_interval(write_failed) == 80
+    assert poller().next_interval(None) == 80
+
+
+def test_coming_soon_caps_the_backoff():
+    result = {"digest": "abc", "short_circuited": True, "statuses": {"COMING SOON": 1}}
+
+    assert poller().next_interval(result) == 60
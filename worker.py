@@ -0,0 +1,76 @@
+"""Run queued alert jobs outside the API process.
+
+Usage: python worker.py [--metrics-port PORT]
+
+Needs REDIS_URL; without it the API runs jobs on its own local worker processes.
+"""
+import argparse
+import signal
+import sys
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from dotenv import load_dotenv
+
+import metrics
+from jobs import RedisJobQueue, init_worker, job_queue
+from migrate import check_schema
+
+# Load environment variables from the .env file
+load_dotenv()
+
+
+class MetricsHandler(BaseHTTPRequestHandler):
+    """Serve this worker's pipeline metrics for Prometheus to scrape."""
+
+    def do_GET(self):
+        body = metrics.render().encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--metrics-port', type=int, help='serve Prometheus metrics on this port')
+    args = parser.parse_args()
+
+    if not isinstance(job_queue, RedisJobQueue):
+        print("❌ REDIS_URL is not set; the API runs jobs on local worker processes instead.")
+        return 1
+
+    if args.metrics_port and metrics.METRICS_ENABLED:
+        server = ThreadingHTTPServer(('0.0.0.0', args.metrics_port), MetricsHandler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+
+    stop = threading.Event()
+    signal.signal(signal.SIGTERM, lambda *_: stop.set())
+    init_worker()
+    try:
+        check_schema()
+        print("👷 Waiting for alert jobs.")
+        job_queue.work(stop)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        from db_connection import pool as db_pool
+        from driver_pool import driver_pool
+        from notifier import close_notifier
+        from scraper import close_http_client
+
+        driver_pool.close()
+        db_pool.close()
+        if 'db_async' in sys.modules:  # Opened only by PIPELINE_MODE=async runs
+            sys.modules['db_async'].close()
+        close_notifier()
+        close_http_client()
+    return 0
+
+
+if __name__ == '__main__':
+    raise SystemExit(main())